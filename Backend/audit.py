@@ -0,0 +1,92 @@
+# audit.py
+# Append-only audit store for prompts and responses.
+#
+# Records are handed to a background thread through a queue, so the request
+# thread never blocks on disk. The writer appends one JSON line per record to
+# outputs/audit/audit.jsonl, and when that file passes AUDIT_MAX_BYTES it is
+# rotated into a gzip-compressed segment (audit-<timestamp>.jsonl.gz). Only the
+# newest AUDIT_BACKUP_COUNT segments are kept.
+import os
+import json
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import logging
+import threading
+from pathlib import Path
+
+AUDIT_DIR = Path(os.environ.get("AUDIT_DIR", "outputs/audit"))
+AUDIT_MAX_BYTES = int(os.environ.get("AUDIT_MAX_BYTES", str(10 * 1024 * 1024)))
+AUDIT_BACKUP_COUNT = int(os.environ.get("AUDIT_BACKUP_COUNT", "50"))
+
+logger = logging.getLogger("tier05.audit")
+
+
+class AuditWriter(threading.Thread):
+    def __init__(self, directory: Path = AUDIT_DIR, max_bytes: int = AUDIT_MAX_BYTES,
+                 backup_count: int = AUDIT_BACKUP_COUNT):
+        super().__init__(daemon=True, name="audit-writer")
+        self.directory = Path(directory)
+        self.path = self.directory / "audit.jsonl"
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+
+    def submit(self, record: dict):
+        """Queue a record for writing; never blocks the caller."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning("audit queue full, dropping record %s", record.get("request_id"))
+
+    def close(self, timeout: float = 5.0):
+        self._queue.put(None)
+        self.join(timeout)
+
+    def run(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            # drain whatever else is waiting so a burst costs one open/write
+            while True:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._write(batch)
+                    return
+                batch.append(nxt)
+            self._write(batch)
+
+    def _write(self, batch: list[dict]):
+        try:
+            with self.path.open("a", encoding="utf-8") as f:
+                for record in batch:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            if self.path.stat().st_size >= self.max_bytes:
+                self._rotate()
+        except Exception:
+            logger.exception("failed to write audit records")
+
+    def _rotate(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        target = self.directory / f"audit-{stamp}-{time.time_ns() % 1_000_000:06d}.jsonl.gz"
+        rotating = self.path.with_suffix(".rotating")
+        self.path.replace(rotating)
+        with rotating.open("rb") as src, gzip.open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotating.unlink()
+        segments = sorted(self.directory.glob("audit-*.jsonl.gz"))
+        for old in segments[:-self.backup_count] if self.backup_count > 0 else []:
+            old.unlink()
+
+
+audit_writer = AuditWriter()
+audit_writer.start()
+atexit.register(audit_writer.close)
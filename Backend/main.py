@@ -9,105 +9,196 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+import uuid
+import hashlib
+import sys
+import logging
+from pathlib import Path
 from flask import Flask, request, Response, stream_with_context
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))  # helpers shared with the Frontend
+from profiling import init_profiling
+from audit import audit_writer
+from singleflight import SingleFlight
+from prefetch import prefetch_cache, count_tokens, estimate_log_tokens, PROMPT_TOKEN_WARN
+from providers import LLM_BASE_URL, build_router
+from report_library import ReportLibrary, alert_query_text
+
 api_key = "<your openai api key here>"
 client = chromadb.PersistentClient(path="./chroma_db")
 openai.api_key = api_key
 
-def rag_chat(user_query,
-             initial_analysis,
-             customer_info,
-             log,
-             alert,
-             collection_name="soc_playbooks_v6",
-             playbooks_file="RagData/playbooks.json",
-             n_results=2):
-    client = chromadb.PersistentClient(path="./chroma_db")
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("tier05.backend")
+llm_router = build_router(api_key)
+report_library = ReportLibrary()
+
+PLAYBOOK_PHASES = ("containment", "eradication", "recovery_and_restore")
+
+# Each playbook action carries a "scope": EDR for work on the endpoint itself, XDR for
+# identities, mail and network controls. Actions without one (investigation, reporting,
+# lessons learned) are listed under the neutral "Remediation:" heading.
+ACTION_SCOPES = ("EDR", "XDR")
+UNSCOPED = "ALL"
+
+
+def action_scope(item):
+    scope = str(item.get("scope") or "").strip().upper()
+    return scope if scope in ACTION_SCOPES else UNSCOPED
+
+
+def contract_type_of(customer):
+    if isinstance(customer, dict):
+        return str(customer.get("mdr_contract_type") or "").strip().upper()
+    return ""
+
+
+def customer_name_of(customer):
+    if isinstance(customer, dict):
+        return str(customer.get("name") or "")
+    return ""
+
+
+def playbook_chunks(pb):
+    """Split one playbook into chunks: an overview used for matching, one chunk per
+    phase and contract scope, and the derived verification criteria."""
+    pb_id = pb["id"]
+    title = pb.get("playbook_name", "Untitled Playbook")
+    description = pb.get("description", "")
+    alert_description = (pb.get("alert_description") or {}).get("description", "")
+
+    chunks = [(
+        f"{pb_id}::overview",
+        f"{title}\n{description}\n{alert_description}".strip(),
+        {"playbook_id": pb_id, "title": title, "phase": "overview", "scope": "ALL",
+         "summary": description}
+    )]
+
+    rec = pb.get("recommended_actions", {}) or {}
+    for phase_key in PLAYBOOK_PHASES:
+        phase_name = phase_key.replace("_", " ").title()
+        steps = {scope: [] for scope in ACTION_SCOPES + (UNSCOPED,)}
+        for it in rec.get(phase_key, []) or []:
+            action = (it.get("action") or "").strip()
+            desc = (it.get("description") or "").strip()
+            if action and desc:
+                step = f"{phase_name}: {action} — {desc}"
+            elif action:
+                step = f"{phase_name}: {action}"
+            elif desc:
+                step = f"{phase_name}: {desc}"
+            else:
+                continue
+            steps[action_scope(it)].append(step)
+        for scope, lines in steps.items():
+            if lines:
+                chunks.append((
+                    f"{pb_id}::{phase_key}::{scope.lower()}",
+                    "\n".join(lines),
+                    {"playbook_id": pb_id, "title": title, "phase": phase_key, "scope": scope}
+                ))
+
+    # Derive simple verification criteria from recovery_and_restore actions
+    verification_criteria = []
+    for it in rec.get("recovery_and_restore", []) or []:
+        action = (it.get("action") or "").strip()
+        if action:
+            verification_criteria.append(f"Completed: {action}")
+    if not verification_criteria:
+        # keep minimal, generic checks if recovery actions are empty
+        verification_criteria = [
+            "No related alerts or anomalous activity observed for 48 hours.",
+            "All containment and eradication steps completed and documented.",
+            "Affected accounts/devices restored to known-good state and monitored."
+        ]
+    chunks.append((
+        f"{pb_id}::verification",
+        "\n".join(verification_criteria),
+        {"playbook_id": pb_id, "title": title, "phase": "verification", "scope": "ALL"}
+    ))
+    return chunks
+
+
+_collections = {}
+
+
+def get_playbook_collection(collection_name="soc_playbooks_v8", playbooks_file="RagData/playbooks.json"):
+    """Open (and on first use, index) the chunked playbook collection."""
+    if collection_name in _collections:
+        return _collections[collection_name]
 
     embedding_func = embedding_functions.OpenAIEmbeddingFunction(
         api_key=api_key,
-        model_name="text-embedding-3-small"
+        model_name="text-embedding-3-small",
+        api_base=LLM_BASE_URL
+    )
+    collection = client.get_or_create_collection(
+        name=collection_name,
+        embedding_function=embedding_func
     )
-
-    try:
-        collection = client.get_collection(
-            name=collection_name,
-            embedding_function=embedding_func
-        )
-    except:
-        collection = client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=embedding_func
-        )
 
     if collection.count() == 0:
         with open(playbooks_file, "r", encoding="utf-8") as f:
             playbooks = json.load(f)
-
+        ids, documents, metadatas = [], [], []
         for pb in playbooks:
-            # New-schema fields (+ id you added)
-            pb_id = pb["id"]  # now required, since you added it
-            title = pb.get("playbook_name", "Untitled Playbook")
-            description = pb.get("description", "")
-
-            # Flatten new recommended_actions -> remediation steps (strings)
-            remediation_steps = []
-            rec = pb.get("recommended_actions", {}) or {}
-            for phase_key in ("containment", "eradication", "recovery_and_restore"):
-                items = rec.get(phase_key, []) or []
-                phase_name = phase_key.replace("_", " ").title()
-                for it in items:
-                    action = (it.get("action") or "").strip()
-                    desc = (it.get("description") or "").strip()
-                    if action and desc:
-                        remediation_steps.append(f"{phase_name}: {action} — {desc}")
-                    elif action:
-                        remediation_steps.append(f"{phase_name}: {action}")
-                    elif desc:
-                        remediation_steps.append(f"{phase_name}: {desc}")
-
-            # Derive simple verification criteria from recovery_and_restore actions
-            verification_criteria = []
-            for it in rec.get("recovery_and_restore", []) or []:
-                action = (it.get("action") or "").strip()
-                if action:
-                    verification_criteria.append(f"Completed: {action}")
-            if not verification_criteria:
-                # keep minimal, generic checks if recovery actions are empty
-                verification_criteria = [
-                    "No related alerts or anomalous activity observed for 48 hours.",
-                    "All containment and eradication steps completed and documented.",
-
-                    "Affected accounts/devices restored to known-good state and monitored."
-                ]
-
-            # Build the single document string as your original code expects
-            content = (
-                    description + "\nRemediation:\n" +
-                    "\n".join(remediation_steps) + "\nVerification:\n" +
-                    "\n".join(verification_criteria)
-            )
-
-            collection.add(
-                ids=[pb_id],
-                documents=[content],
-                metadatas=[{"title": title}]
-            )
+            for chunk_id, document, metadata in playbook_chunks(pb):
+                ids.append(chunk_id)
+                documents.append(document)
+                metadatas.append(metadata)
+        collection.add(ids=ids, documents=documents, metadatas=metadatas)
+
+    _collections[collection_name] = collection
+    return collection
+
+
+def retrieve_playbook(collection, user_query, contract_type="", n_results=1):
+    """Find the playbook(s) matching the alert type and assemble only their action
+    chunks, split by what the SOC may execute under the customer's contract."""
     results = collection.query(
         query_texts=[user_query],
-        n_results=n_results
+        n_results=n_results,
+        where={"phase": "overview"}
     )
 
-    retrieved_texts = results['documents'][0]
-    playbook = "\n\n".join(retrieved_texts)
-
-    ########################################################################################################################
-    # Final prompt that is being sent in with the following parameters:
-    # Alerts, Logs, initial analysis, customer info and playbook (RAG)
-    ########################################################################################################################
-
-    prompt = f"""
+    parts = []
+    for meta in results["metadatas"][0]:
+        chunks = collection.get(where={"$and": [
+            {"playbook_id": meta["playbook_id"]},
+            {"phase": {"$in": list(PLAYBOOK_PHASES)}},
+        ]})
+        ordered = sorted(zip(chunks["documents"], chunks["metadatas"]),
+                         key=lambda dm: PLAYBOOK_PHASES.index(dm[1]["phase"]))
+        by_scope = {scope: [] for scope in ACTION_SCOPES + (UNSCOPED,)}
+        for document, chunk_meta in ordered:
+            by_scope[chunk_meta["scope"]].append(document)
+
+        text = f"Playbook: {meta['title']}\n{meta.get('summary', '')}\n"
+        if contract_type == "EDR":
+            text += ("Actions the SOC can execute (endpoint, EDR contract):\n" + "\n".join(by_scope["EDR"]) +
+                     "\nActions the customer must perform:\n" + "\n".join(by_scope["XDR"]))
+        elif contract_type == "XDR":
+            text += ("Actions the SOC can execute (XDR contract):\n" +
+                     "\n".join(by_scope["EDR"] + by_scope["XDR"]))
+        else:
+            text += "Remediation:\n" + "\n".join(document for document, _ in ordered)
+        if contract_type in ACTION_SCOPES and by_scope[UNSCOPED]:
+            text += "\nRemediation:\n" + "\n".join(by_scope[UNSCOPED])
+        parts.append(text)
+    return "\n\n".join(parts)
+
+
+########################################################################################################################
+# Final prompt that is being sent in with the following parameters:
+# Alerts, Logs, initial analysis, customer info, playbook (RAG) and, when the report library has any,
+# one or two earlier reports for the same alert type as examples
+# The report template is split into its sections, so a report can be generated as one completion
+# or one completion per section (REPORT_SECTIONS order is the order of the finished report).
+########################################################################################################################
+
+PROMPT_CONTEXT = """
 You are going to act as an assistance for a Tier 1 MDR SOC analyst. 
 Your goal is to help the analyst create a template for a SOC report, based on: 
 1) The initial alert and hypothesis provided by the analyst. 
@@ -136,20 +227,31 @@ If the customer has mdr_contract_type=XDR then the Tier 1 SOC analyst can do mor
 
 Use the following playbook information to help generate the report template:
 {playbook}
-
+{exemplars}
 With all this information, fill in the following report template strictly, in a concise way, suitable for sending to a MDR customer. 
 All parts of the report must be precise, with no unnecessary tangents or unnecessarily complicated wording. 
 The report should be simple and understandable for MDR customers. 
+"""
 
+TEMPLATE_INTRO = """
 Fill in the following template:
 ------------------------------------------------------------------------------------------------------------------------------
-Title:
+"""
+
+SECTION_INTRO = """
+Write ONLY the following part of the report template, nothing before or after it. Start with its heading exactly as given (if it has one), and fill it in strictly:
+------------------------------------------------------------------------------------------------------------------------------
+"""
+
+REPORT_SECTIONS = {
+    "header": """Title:
 Date:
 Alert Type/Category: e.g., Attempted Compromise
 Severity: Low / Medium / High / Critical
 Analyst Name: Let this be blank, for the analyst to fill in
 Case #:
-
+""",
+    "alert_summary": """
 # DETECTION AND ANALYSIS
 
 ## Alert Summary:
@@ -164,7 +266,8 @@ Follow these instructions exactly:
 7. Avoid ending with a one-sentence recap of all findings. This entire section is the summary.
 8. Optionally conclude with: “We recommend that you investigate this activity further, as the activity appears to X.”
 9. The text should read like a single cohesive summary paragraph, not a list or procedural walkthrough. *
-
+""",
+    "key_details": """
 ## Key Details:
 *Write the "Key Details" section for an MDR SOC report.
 Follow these instructions exactly:
@@ -184,11 +287,13 @@ If multiple values exist for a single item type (such as several domains or IP a
 5. Do not include where the data originated in this section (e.g., Defender, Sentinel, SIEM, etc.). Only the data itself.
 6. Keep entries factual and concise — no sentences, commentary, or explanations unless it’s a short clarification (e.g., “Encoded PowerShell command used for payload retrieval”).
 7. Maintain a consistent, clean layout with one item per line. Avoid extra spacing or markdown formatting beyond basic colons and line breaks.*
-
+""",
+    "consequence": """
 ## Consequence:
 *Describe the potential or confirmed impact of the incident, such as data exposure, privilege escalation, lateral movement, or system compromise. No not use bullet-points here, write as a text.
 This section should not include any containment suggestions.*
-
+""",
+    "executed_remediation": """
 # CONTAINMENT
 * This section should exclusively focus on immediate remediation actions, both that the SOC has done, and that the customer needs to do themselves*
 
@@ -201,7 +306,8 @@ This section should not include any containment suggestions.*
 5. Be brief in wording: (e.g. Isolated the host, due to X) is good enough. 
 6. If no specific actions can be performed by the SOC (e.g., for EDR customers), you may write: "No actions applicable by the MDR SOC due to customer contract."
 *
-
+""",
+    "recommended_remediation": """
 ## Recommended Remediation Actions:
 * Start this section with the following: "Our SOC recommends that you do the following containment actions:"
 1. Use bullet points to list out concrete immediate containment and eradication actions that the customer must do (that the SOC could not do), in order to contain, remediate or resolve the identified threat.  
@@ -209,36 +315,141 @@ This section should not include any containment suggestions.*
 3. Do not come up with any points regarding strategy, governance and compliance, or similar, here. That is not the scope for these reports. Just concrete actions that needs to be taken.  
 4. If all remediation actions have been completed by the MDR SOC and the report is intended solely to inform the customer (e.g., for XDR customers), you may write: "All remediation actions have been completed by the MDR SOC."
 *
+""",
+}
+
+EXEMPLARS_INTRO = """
+Earlier reports for the same alert type, approved by analysts. Match their structure, tone and level of detail, but only use facts from the data above:
 """
 
-    ########################################################################################################################
 
-    with open("outputs/prompt_in.txt", "w", encoding="utf-8") as f:
-        f.write(prompt)
+def format_exemplars(exemplars):
+    # empty when there are none, so the prompt is unchanged
+    if not exemplars:
+        return ""
+    return EXEMPLARS_INTRO + "\n---\n".join(exemplars) + "\n"
 
-    # --- Call ChatGPT ---; seed 42 ensures more consistency of output.
-    response = openai.chat.completions.create(
-        model="gpt-5",
-        messages=[{"role": "user", "content": prompt}],
-        top_p=1,
-        seed=42
-    )
 
-    return response.choices[0].message.content
+# Fixed part of a full prompt, for the token estimates made at prefetch time
+TEMPLATE_TOKENS = count_tokens(PROMPT_CONTEXT + TEMPLATE_INTRO + "".join(REPORT_SECTIONS.values()))
 
-app = Flask(__name__)
 
+# Where each section starts in a finished draft, used to cut one section out for regeneration
+SECTION_MARKERS = {
+    "header": r"\A",
+    "alert_summary": r"^#+\s*DETECTION AND ANALYSIS|^#+\s*Alert Summary",
+    "key_details": r"^#+\s*Key Details",
+    "consequence": r"^#+\s*Consequence",
+    "executed_remediation": r"^#+\s*CONTAINMENT|^#+\s*Executed Remediation",
+    "recommended_remediation": r"^#+\s*Recommended Remediation",
+}
 
-@app.post("/llm")
-def llm_endpoint():
-    os.makedirs("outputs", exist_ok=True)
-    print("got a request for /llm endpoint\n waiting for a response")
-    try:
-        payload = request.get_json(force=True) or {}
-    except Exception as e:
-        return Response(f"bad json: {e}\n", status=400, mimetype="text/plain")
-    print("Request I retrived was", payload)
 
+def rag_chat(user_query,
+             initial_analysis,
+             customer_info,
+             log,
+             alert,
+             collection_name="soc_playbooks_v8",
+             playbooks_file="RagData/playbooks.json",
+             n_results=1,
+             contract_type="",
+             playbook=None,
+             mode="full",
+             exemplars=None,
+             trace=None):
+    # trace (optional dict) is filled with the prompt and timings for the audit store
+    if trace is None:
+        trace = {}
+    t_start = time.perf_counter()
+    # playbook is passed in when /prefetch already retrieved it for this case
+    if playbook is None:
+        collection = get_playbook_collection(collection_name, playbooks_file)
+        playbook = retrieve_playbook(collection, user_query, contract_type, n_results)
+    trace["retrieval_ms"] = round((time.perf_counter() - t_start) * 1000, 1)
+
+    context = PROMPT_CONTEXT.format(alert=alert, log=log, initial_analysis=initial_analysis,
+                                    customer_info=customer_info, playbook=playbook,
+                                    exemplars=format_exemplars(exemplars))
+
+    t_llm = time.perf_counter()
+    if mode == "sections":
+        # one smaller completion per section, all sharing the same context
+        trace["prompt"] = context + SECTION_INTRO + "<section>"
+        with ThreadPoolExecutor(max_workers=len(REPORT_SECTIONS)) as pool:
+            parts = list(pool.map(lambda section: call_llm(context + SECTION_INTRO + section, trace),
+                                  REPORT_SECTIONS.values()))
+        answer = "\n\n".join(part.strip() for part in parts)
+    else:
+        prompt = context + TEMPLATE_INTRO + "".join(REPORT_SECTIONS.values())
+        trace["prompt"] = prompt
+        answer = call_llm(prompt, trace)
+    trace["llm_ms"] = round((time.perf_counter() - t_llm) * 1000, 1)
+    return answer
+
+
+def call_llm(prompt, trace=None):
+    # --- Call ChatGPT ---; seed 42 ensures more consistency of output.
+    # The router enforces a deadline and hedges to a faster model when the primary is slow.
+    completion = llm_router.complete(prompt, top_p=1, seed=42)
+    if completion.hedged:
+        logger.info("completion served by %s after hedging (%.1f s)", completion.model, completion.elapsed_s)
+    if trace is not None:
+        # which model wrote the text, reported back to the analyst
+        trace.setdefault("models", []).append(completion.model)
+    return completion.text
+
+
+def models_used(trace):
+    return ",".join(sorted(set(trace.get("models") or [])))
+
+
+def split_sections(draft):
+    """Map section name -> (start, end) offsets of that section in a finished draft."""
+    starts = []
+    for name, marker in SECTION_MARKERS.items():
+        m = re.search(marker, draft, flags=re.MULTILINE | re.IGNORECASE)
+        if m:
+            starts.append((m.start(), name))
+    starts.sort()
+    spans = {}
+    for i, (start, name) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(draft)
+        spans.setdefault(name, (start, end))
+    return spans
+
+
+def regenerate_section(section, draft, user_query, initial_analysis, customer_info, log, alert,
+                       contract_type="", playbook=None, exemplars=None, trace=None):
+    """Regenerate one named section of an existing draft and splice it back in place."""
+    if trace is None:
+        trace = {}
+    t_start = time.perf_counter()
+    if playbook is None:
+        playbook = retrieve_playbook(get_playbook_collection(), user_query, contract_type)
+    trace["retrieval_ms"] = round((time.perf_counter() - t_start) * 1000, 1)
+
+    context = PROMPT_CONTEXT.format(alert=alert, log=log, initial_analysis=initial_analysis,
+                                    customer_info=customer_info, playbook=playbook,
+                                    exemplars=format_exemplars(exemplars))
+    prompt = context + SECTION_INTRO + REPORT_SECTIONS[section]
+    trace["prompt"] = prompt
+    t_llm = time.perf_counter()
+    new_text = call_llm(prompt, trace).strip()
+    trace["llm_ms"] = round((time.perf_counter() - t_llm) * 1000, 1)
+
+    spans = split_sections(draft)
+    if section in spans:
+        start, end = spans[section]
+        return draft[:start] + new_text + "\n\n" + draft[end:].lstrip("\n")
+    # section missing from the draft: put it after the sections that come before it
+    order = list(REPORT_SECTIONS)
+    following = [spans[n][0] for n in order[order.index(section) + 1:] if n in spans]
+    at = min(following) if following else len(draft)
+    return draft[:at].rstrip("\n") + "\n\n" + new_text + "\n\n" + draft[at:]
+
+def parse_llm_payload(payload):
+    """Pull (type, customer, log_lines, siem_alert, initial_analysis) out of a Frontend payload."""
     siem_alert_dict = payload.get("siem_alert") or []
     if isinstance(siem_alert_dict, dict) and "raw" in siem_alert_dict:
         siem_alert_item = siem_alert_dict.get("raw") or []
@@ -259,18 +470,246 @@ def llm_endpoint():
     log_lines = payload.get("log_lines") or []
     siem_alert = payload.get("siem_alert") or {}
     initial_analysis = payload.get("initial_analysis") or ""
+    return user_query, customer, log_lines, siem_alert, initial_analysis
 
-    print("user_query", user_query)
-    print("customer", customer)
-    print("log_lines", log_lines)
-    print("siem_alert", siem_alert)
-    print("initial_analysis", initial_analysis)
 
-    answer = rag_chat(str(user_query), initial_analysis, str(customer), log_lines, siem_alert)
-    with open("outputs/response.txt", "w", encoding="utf-8") as f:
-        f.write(answer)
-    print("we got the answer: ", answer)
-    return Response(answer, mimetype="text/plain")
+def request_fingerprint(user_query, customer, log_lines, siem_alert, initial_analysis, mode="full"):
+    """Stable hash of everything that shapes the generated report."""
+    normalised = {
+        "mode": mode,
+        "type": str(user_query).strip().lower(),
+        "customer": customer,
+        "log_lines": [str(line).strip() for line in log_lines] if isinstance(log_lines, list) else str(log_lines),
+        "siem_alert": siem_alert,
+        "initial_analysis": " ".join(str(initial_analysis).split()),
+    }
+    blob = json.dumps(normalised, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
 
-app.run(host="0.0.0.0", port=8000, debug=True)
+# Concurrent identical /llm requests (double clicks, two analysts on one alert) share one generation
+llm_flight = SingleFlight()
+
+app = Flask(__name__)
+init_profiling(app, paths=("/llm",))
+
+
+@app.post("/llm")
+def llm_endpoint():
+    request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+    t_start = time.perf_counter()
+    logger.info("llm request %s received", request_id)
+    try:
+        payload = request.get_json(force=True) or {}
+    except Exception as e:
+        return Response(f"bad json: {e}\n", status=400, mimetype="text/plain")
+
+    user_query, customer, log_lines, siem_alert, initial_analysis = parse_llm_payload(payload)
+    contract_type = contract_type_of(customer)
+    case_id = str(payload.get("case_id") or "")
+    mode = "sections" if payload.get("mode") == "sections" else "full"
+
+    logger.info("llm request %s type=%r log_lines=%d initial_analysis_chars=%d",
+                request_id, user_query, len(log_lines), len(initial_analysis))
+    # customer data and raw evidence only at DEBUG
+    logger.debug("llm request %s customer=%s siem_alert=%s log_lines=%s",
+                 request_id, customer, siem_alert, log_lines)
+
+    fingerprint = request_fingerprint(user_query, customer, log_lines, siem_alert, initial_analysis, mode)
+    trace = {}
+    prefetched = prefetch_cache.get(case_id)
+    if prefetched and (prefetched["type"], prefetched["contract_type"]) != (str(user_query), contract_type):
+        prefetched = None
+    trace["prefetch_hit"] = prefetched is not None
+
+    def generate():
+        exemplars = report_library.exemplars(user_query, f"{alert_query_text(siem_alert)}\n{initial_analysis}",
+                                             case_id=case_id)
+        trace["exemplars"] = len(exemplars)
+        if prefetched:
+            # template, playbook, alert and customer were counted at prefetch time
+            trace["prompt_tokens"] = (prefetched["base_tokens"]
+                                      + count_tokens(str(log_lines)) + count_tokens(initial_analysis)
+                                      + count_tokens(format_exemplars(exemplars)))
+            if trace["prompt_tokens"] > PROMPT_TOKEN_WARN:
+                logger.warning("llm request %s: prompt is ~%d tokens (limit %d), %d log lines tagged",
+                               request_id, trace["prompt_tokens"], PROMPT_TOKEN_WARN, len(log_lines))
+        answer = rag_chat(str(user_query), initial_analysis, str(customer), log_lines, siem_alert,
+                          contract_type=contract_type,
+                          playbook=prefetched["playbook"] if prefetched else None,
+                          mode=mode,
+                          exemplars=exemplars,
+                          trace=trace)
+        # kept in the library; it is only used as an exemplar once an analyst approves it
+        report_library.add(answer, user_query, customer_name_of(customer), case_id or None)
+        return answer, request_id, models_used(trace)
+
+    error = None
+    answer = ""
+    model = ""
+    leader_id = request_id
+    shared = False
+    try:
+        (answer, leader_id, model), shared = llm_flight.do(fingerprint, generate)
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        total_ms = round((time.perf_counter() - t_start) * 1000, 1)
+        audit_writer.submit({
+            "request_id": request_id,
+            "ts": time.time(),
+            "type": user_query,
+            "mode": mode,
+            "fingerprint": fingerprint,
+            # a coalesced request points at the generation it shared instead of repeating it
+            "coalesced_with": leader_id if shared else None,
+            "case_id": case_id or None,
+            "prefetch_hit": trace.get("prefetch_hit"),
+            "exemplars": trace.get("exemplars"),
+            "prompt_tokens": trace.get("prompt_tokens"),
+            "model": model or None,
+            "prompt": trace.get("prompt"),
+            "response": None if shared else answer,
+            "error": error,
+            "timings_ms": {
+                "retrieval": trace.get("retrieval_ms"),
+                "llm": trace.get("llm_ms"),
+                "total": total_ms,
+            },
+        })
+        logger.info("llm request %s done in %.1f ms (retrieval %s ms, llm %s ms)%s%s",
+                    request_id, total_ms, trace.get("retrieval_ms"), trace.get("llm_ms"),
+                    f" coalesced_with={leader_id}" if shared else "",
+                    f" error={error}" if error else "")
+    return Response(answer, mimetype="text/plain",
+                    headers={"X-Request-Id": request_id, "X-Coalesced": "1" if shared else "0", "X-Model": model})
+
+
+@app.post("/llm/section")
+def llm_section_endpoint():
+    """Regenerate one section of an existing draft.
+
+    Body: the /llm payload plus {"section": <name in REPORT_SECTIONS>, "draft": <current report>}"""
+    request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+    t_start = time.perf_counter()
+    payload = request.get_json(force=True, silent=True) or {}
+    section = str(payload.get("section") or "")
+    draft = str(payload.get("draft") or "")
+    if section not in REPORT_SECTIONS:
+        return Response(f"unknown section {section!r}, expected one of: {', '.join(REPORT_SECTIONS)}\n",
+                        status=400, mimetype="text/plain")
+
+    user_query, customer, log_lines, siem_alert, initial_analysis = parse_llm_payload(payload)
+    contract_type = contract_type_of(customer)
+    case_id = str(payload.get("case_id") or "")
+    prefetched = prefetch_cache.get(case_id)
+    if prefetched and (prefetched["type"], prefetched["contract_type"]) != (str(user_query), contract_type):
+        prefetched = None
+
+    trace = {}
+    error = None
+    answer = ""
+    try:
+        exemplars = report_library.exemplars(user_query, f"{alert_query_text(siem_alert)}\n{initial_analysis}",
+                                             case_id=case_id)
+        answer = regenerate_section(section, draft, str(user_query), initial_analysis, str(customer),
+                                    log_lines, siem_alert, contract_type=contract_type,
+                                    playbook=prefetched["playbook"] if prefetched else None,
+                                    exemplars=exemplars, trace=trace)
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        total_ms = round((time.perf_counter() - t_start) * 1000, 1)
+        audit_writer.submit({
+            "request_id": request_id,
+            "ts": time.time(),
+            "type": user_query,
+            "mode": f"section:{section}",
+            "case_id": case_id or None,
+            "model": models_used(trace) or None,
+            "prompt": trace.get("prompt"),
+            "response": answer,
+            "error": error,
+            "timings_ms": {
+                "retrieval": trace.get("retrieval_ms"),
+                "llm": trace.get("llm_ms"),
+                "total": total_ms,
+            },
+        })
+        logger.info("llm section %s request %s done in %.1f ms%s", section, request_id, total_ms,
+                    f" error={error}" if error else "")
+    return Response(answer, mimetype="text/plain",
+                    headers={"X-Request-Id": request_id, "X-Model": models_used(trace)})
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    return {**llm_flight.stats(), "prefetch": prefetch_cache.stats(), "routing": llm_router.stats(),
+            "report_library": report_library.stats()}
+
+
+@app.post("/reports/approve")
+def approve_report():
+    """Store a report an analyst signed off on as a preferred exemplar for its alert type.
+
+    Body: {"content": <final report>, "siem_alert": <alert payload>, "case_id": ...}"""
+    payload = request.get_json(force=True, silent=True) or {}
+    content = str(payload.get("content") or "").strip()
+    user_query, customer, _, _, _ = parse_llm_payload(payload)
+    if not content or not user_query:
+        return {"error": "content and an alert with a type are required"}, 400
+    report_id = report_library.approve(content, user_query, customer_name_of(customer),
+                                       str(payload.get("case_id") or "") or None)
+    logger.info("approved report %s for type=%r", report_id, user_query)
+    return {"status": "ok", "id": report_id}
+
+
+@app.post("/prefetch")
+def prefetch_endpoint():
+    """Warm everything for a case except the LLM call itself.
+
+    Body: {"case_id": ..., "siem_alert": <alert payload>,
+           "log_line_count": ..., "log_bytes": ... (size of the case's whole log, optional)}"""
+    payload = request.get_json(force=True, silent=True) or {}
+    case_id = str(payload.get("case_id") or "")
+    if not case_id:
+        return {"error": "case_id is required"}, 400
+
+    t_start = time.perf_counter()
+    user_query, customer, _, siem_alert, _ = parse_llm_payload(payload)
+    contract_type = contract_type_of(customer)
+    collection = get_playbook_collection()
+    playbook = retrieve_playbook(collection, str(user_query), contract_type)
+    try:
+        log_line_count = max(0, int(payload.get("log_line_count") or 0))
+        log_bytes = max(0, int(payload.get("log_bytes") or 0))
+    except (TypeError, ValueError):
+        return {"error": "log_line_count and log_bytes must be integers"}, 400
+    tokens = {
+        "template": TEMPLATE_TOKENS,
+        "playbook": count_tokens(playbook),
+        "alert": count_tokens(str(siem_alert)),
+        "customer": count_tokens(str(customer)),
+        # the analyst tags a subset of these, so this is the most the logs can add
+        "log_lines": estimate_log_tokens(log_bytes, log_line_count),
+    }
+    prompt_max = sum(tokens.values())
+    if prompt_max > PROMPT_TOKEN_WARN:
+        logger.warning("case %s: tagging all %d log lines would make a ~%d token prompt (limit %d)",
+                       case_id, log_line_count, prompt_max, PROMPT_TOKEN_WARN)
+    # only what /llm reads back for this case
+    prefetch_cache.put(case_id, {
+        "type": str(user_query),
+        "contract_type": contract_type,
+        "playbook": playbook,
+        "base_tokens": prompt_max - tokens["log_lines"],
+    })
+    elapsed_ms = round((time.perf_counter() - t_start) * 1000, 1)
+    logger.info("prefetched case %s type=%r in %.1f ms, tokens=%s", case_id, user_query, elapsed_ms, tokens)
+    return {"status": "ok", "case_id": case_id, "tokens": tokens, "prompt_max_tokens": prompt_max,
+            "log_line_count": log_line_count, "elapsed_ms": elapsed_ms}
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1,75 @@
+# prefetch.py
+# Short-lived per-case cache for work that can start as soon as an alert is
+# opened: playbook retrieval and token counting. The Frontend calls /prefetch
+# when /logs/<slug> receives the alert, so the later /llm call for the same case
+# only pays for the model. The case's log is sized from its byte and line counts,
+# it is never sent or tokenised here.
+import os
+import time
+import threading
+
+PREFETCH_TTL_S = float(os.environ.get("PREFETCH_TTL_S", "900"))
+PREFETCH_MAX_CASES = 256
+# warn when a case's prompt is estimated above this many tokens
+PROMPT_TOKEN_WARN = int(os.environ.get("PROMPT_TOKEN_WARN", "100000"))
+LOG_BYTES_PER_TOKEN = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional; fall back to the ~4 chars/token rule of thumb
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def estimate_log_tokens(log_bytes: int, line_count: int) -> int:
+    """Tokens a log of this size adds to a prompt, without reading it."""
+    # the prompt holds str(list of lines): quotes and a separator add ~4 chars per line
+    chars = max(0, log_bytes) + 4 * max(0, line_count)
+    return (chars + LOG_BYTES_PER_TOKEN - 1) // LOG_BYTES_PER_TOKEN
+
+
+class TTLCache:
+    def __init__(self, ttl_s: float = PREFETCH_TTL_S, max_items: int = PREFETCH_MAX_CASES):
+        self.ttl_s = ttl_s
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._items: dict[str, tuple[float, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if not key:
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._items.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value: dict):
+        now = time.monotonic()
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (now + self.ttl_s, value)
+            if len(self._items) > self.max_items:
+                for k in [k for k, (exp, _) in self._items.items() if exp < now]:
+                    del self._items[k]
+                while len(self._items) > self.max_items:
+                    # dicts keep insertion order: drop the oldest case
+                    del self._items[next(iter(self._items))]
+
+    def stats(self):
+        with self._lock:
+            return {"cases": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+prefetch_cache = TTLCache()
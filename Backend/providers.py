@@ -0,0 +1,263 @@
+# providers.py
+# Latency-aware routing of chat completions.
+#
+# Every completion goes to the primary model with a hard deadline. If the
+# primary has not produced its first token by the hedge threshold (the p95
+# time-to-first-token seen so far for that model, or LLM_HEDGE_AFTER_S until
+# there are enough samples), the same prompt is also sent to the hedge model and
+# whichever finishes first wins. The loser's stream is closed as soon as the
+# race is decided. If it had no first token yet, the time it waited is recorded
+# as a (censored) first-token sample, a lower bound of the real one, so slow
+# primaries still push the p95 up; otherwise only fast primaries would be
+# sampled and the threshold would drift down.
+#
+# LLM_BASE_URL points everything at any OpenAI-compatible server, e.g. the
+# local stand-in in stub_llm.py.
+import os
+import time
+import queue
+import socket
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+import openai
+
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL") or None
+LLM_PRIMARY_MODEL = os.environ.get("LLM_PRIMARY_MODEL", "gpt-5")
+LLM_HEDGE_MODEL = os.environ.get("LLM_HEDGE_MODEL", "gpt-5-mini")  # empty disables hedging
+LLM_DEADLINE_S = float(os.environ.get("LLM_DEADLINE_S", "600"))
+LLM_HEDGE_AFTER_S = float(os.environ.get("LLM_HEDGE_AFTER_S", "60"))
+LLM_HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Recent time-to-first-token and total latencies for one model."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self.first_token_s = deque(maxlen=window)
+        self.total_s = deque(maxlen=window)
+        self.errors = 0
+
+    def record(self, first_token_s, total_s):
+        with self._lock:
+            if first_token_s is not None:
+                self.first_token_s.append(first_token_s)
+            if total_s is not None:
+                self.total_s.append(total_s)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    @staticmethod
+    def _percentile(samples, q):
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+    def first_token_percentile(self, q):
+        with self._lock:
+            if len(self.first_token_s) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            return self._percentile(self.first_token_s, q)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "samples": len(self.total_s),
+                "errors": self.errors,
+                "first_token_p50_s": self._percentile(self.first_token_s, 50),
+                "first_token_p95_s": self._percentile(self.first_token_s, 95),
+                "total_p50_s": self._percentile(self.total_s, 50),
+                "total_p95_s": self._percentile(self.total_s, 95),
+            }
+
+
+@dataclass
+class Completion:
+    text: str
+    model: str
+    hedged: bool
+    elapsed_s: float
+
+
+class _StreamGuard:
+    """Cuts off a stream's connection when cancel is set while the stream is still being read.
+
+    Closing the response does not wake a thread blocked reading it; shutting down the socket does."""
+
+    def __init__(self, stream, cancel: threading.Event):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._reading = True
+        threading.Thread(target=self._watch, args=(cancel,), daemon=True).start()
+
+    def _watch(self, cancel):
+        cancel.wait()
+        with self._lock:
+            if not self._reading:
+                return  # finished normally; the connection may already be back in the pool
+            network_stream = self._stream.response.extensions.get("network_stream")
+            sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def done(self):
+        with self._lock:
+            self._reading = False
+
+
+class Provider:
+    """One model behind an OpenAI-compatible chat completions API."""
+
+    def __init__(self, model, base_url=None, api_key=None, timeout_s=LLM_DEADLINE_S):
+        self.model = model
+        self.client = openai.OpenAI(
+            api_key=api_key or openai.api_key or os.environ.get("OPENAI_API_KEY"),
+            base_url=base_url,
+            timeout=timeout_s,
+        )
+        self.latency = LatencyTracker()
+
+    def stream(self, prompt, first_token: threading.Event, cancel: threading.Event, **params):
+        """Stream one completion; returns the text, or None if cancelled."""
+        t_start = time.perf_counter()
+        first_token_s = None
+        parts = []
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **params
+            )
+            # the router sets cancel once the race is decided, also after a normal finish
+            guard = _StreamGuard(stream, cancel)
+            with stream:
+                try:
+                    for chunk in stream:
+                        if cancel.is_set():
+                            break
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta and first_token_s is None:
+                            first_token_s = time.perf_counter() - t_start
+                            first_token.set()
+                        if delta:
+                            parts.append(delta)
+                finally:
+                    guard.done()
+        except Exception:
+            if not cancel.is_set():
+                self.latency.record_error()
+                raise
+        if cancel.is_set():
+            # lost the race (or the deadline): without a first token, the time waited is a lower bound
+            self.latency.record(first_token_s if first_token_s is not None else time.perf_counter() - t_start, None)
+            return None
+        self.latency.record(first_token_s, time.perf_counter() - t_start)
+        return "".join(parts)
+
+
+class Router:
+    def __init__(self, primary: Provider, hedge: Provider | None = None, deadline_s: float = LLM_DEADLINE_S):
+        self.primary = primary
+        self.hedge = hedge
+        self.deadline_s = deadline_s
+        self._lock = threading.Lock()
+        self.hedges_started = 0
+        self.hedges_won = 0
+        self.deadlines_missed = 0
+
+    def hedge_after_s(self):
+        p95 = self.primary.latency.first_token_percentile(95)
+        return p95 if p95 is not None else LLM_HEDGE_AFTER_S
+
+    def complete(self, prompt, deadline_s=None, **params) -> Completion:
+        deadline = time.monotonic() + (deadline_s or self.deadline_s)
+        t_start = time.perf_counter()
+        cancel = threading.Event()
+        results = queue.Queue()
+
+        def run(provider, first_token):
+            try:
+                results.put((provider, provider.stream(prompt, first_token, cancel, **params), None))
+            except Exception as e:
+                results.put((provider, None, e))
+            finally:
+                first_token.set()  # finished or failed: either way, stop waiting for tokens
+
+        def start_hedge():
+            with self._lock:
+                self.hedges_started += 1
+            threading.Thread(target=run, args=(self.hedge, threading.Event()), daemon=True).start()
+
+        primary_first = threading.Event()
+        threading.Thread(target=run, args=(self.primary, primary_first), daemon=True).start()
+        running = 1
+
+        hedged = False
+        if self.hedge is not None:
+            wait_s = min(self.hedge_after_s(), max(0.0, deadline - time.monotonic()))
+            if not primary_first.wait(wait_s) and time.monotonic() < deadline:
+                hedged = True
+                start_hedge()
+                running += 1
+
+        error = None
+        try:
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    provider, text, err = results.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                running -= 1
+                if err is not None:
+                    error = err
+                    if self.hedge is not None and not hedged:
+                        # primary failed before the hedge threshold: fall back right away
+                        hedged = True
+                        start_hedge()
+                        running += 1
+                    continue
+                if provider is self.hedge and hedged:
+                    with self._lock:
+                        self.hedges_won += 1
+                return Completion(text, provider.model, hedged, time.perf_counter() - t_start)
+        finally:
+            cancel.set()
+
+        if error is not None and running == 0:
+            raise error
+        with self._lock:
+            self.deadlines_missed += 1
+        raise TimeoutError(f"no completion within {deadline_s or self.deadline_s:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                "hedges_started": self.hedges_started,
+                "hedges_won": self.hedges_won,
+                "deadlines_missed": self.deadlines_missed,
+                "hedge_after_s": self.hedge_after_s(),
+            }
+        models = {self.primary.model: self.primary.latency.stats()}
+        if self.hedge is not None:
+            models[self.hedge.model] = self.hedge.latency.stats()
+        return {**counters, "models": models}
+
+
+def build_router(api_key=None):
+    primary = Provider(LLM_PRIMARY_MODEL, base_url=LLM_BASE_URL, api_key=api_key)
+    hedge = None
+    if LLM_HEDGE_MODEL and LLM_HEDGE_MODEL != LLM_PRIMARY_MODEL:
+        hedge = Provider(LLM_HEDGE_MODEL, base_url=LLM_BASE_URL, api_key=api_key)
+    return Router(primary, hedge)
@@ -0,0 +1,174 @@
+# report_library.py
+# Indexed library of past reports, used to pick few-shot exemplars.
+#
+# Every generated report is stored, and reports an analyst exported are marked
+# approved. Only approved reports are used as exemplars, so the model never sees
+# its own unreviewed drafts again. Reports live in SQLite with alert type/customer
+# columns and an FTS5 index over the text, so picking the best one or two prior
+# reports for an alert type is a single indexed query instead of a scan over files.
+# Curated examples in RagData/good chatgpt outputs/ seed an empty library.
+import os
+import re
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+REPORT_DB = Path(os.environ.get("REPORT_DB", "outputs/reports.sqlite3"))
+SEED_DIR = Path("RagData/good chatgpt outputs")
+EXEMPLAR_MAX_CHARS = 2500
+MAX_QUERY_TERMS = 24
+# parts of an alert object whose values make good query terms (hosts, users, IPs, processes)
+ALERT_QUERY_FIELDS = ("entities", "indicators")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    alert_type TEXT NOT NULL,
+    customer TEXT NOT NULL DEFAULT '',
+    case_id TEXT,
+    approved INTEGER NOT NULL DEFAULT 0,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_type_approved ON reports(alert_type, approved, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(content, content='reports', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS reports_ai AFTER INSERT ON reports BEGIN
+    INSERT INTO reports_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_ad AFTER DELETE ON reports BEGIN
+    INSERT INTO reports_fts(reports_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+def normalise_type(alert_type) -> str:
+    return " ".join(str(alert_type or "").lower().split())
+
+
+def report_body(text: str) -> str:
+    """Drop anything before the report itself (e.g. the prompt kept in curated examples)."""
+    m = re.search(r"^Title:", text, flags=re.MULTILINE)
+    return text[m.start():].strip() if m else text.strip()
+
+
+def compact(text: str, max_chars: int = EXEMPLAR_MAX_CHARS) -> str:
+    """Trim a report to max_chars at a line boundary."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + "\n[...]"
+
+
+def fts_query(text: str) -> str:
+    terms = []
+    for word in re.findall(r"[A-Za-z0-9]{3,}", text or ""):
+        word = word.lower()
+        if word not in terms:
+            terms.append(word)
+        if len(terms) >= MAX_QUERY_TERMS:
+            break
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+def _values(value):
+    """Leaf values of nested JSON, without its keys and timestamps."""
+    if isinstance(value, dict):
+        for key, v in value.items():
+            if not str(key).lower().endswith(("time", "timestamp")):
+                yield from _values(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _values(v)
+    elif value not in (None, ""):
+        yield str(value)
+
+
+def alert_query_text(siem_alert) -> str:
+    """Entity and indicator values of the alert objects, for fts_query.
+
+    JSON keys and the Customer entry would otherwise use up the MAX_QUERY_TERMS budget."""
+    items = siem_alert.get("raw", siem_alert) if isinstance(siem_alert, dict) else siem_alert
+    if not isinstance(items, list):
+        items = [items]
+    values = []
+    for it in items:
+        if isinstance(it, dict) and "Customer" not in it:
+            for field in ALERT_QUERY_FIELDS:
+                values.extend(_values(it.get(field)))
+    return " ".join(values)
+
+
+class ReportLibrary:
+    def __init__(self, path: Path = REPORT_DB, seed_dir: Path = SEED_DIR):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        if self._db.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 0:
+            self.seed(seed_dir)
+
+    def seed(self, seed_dir: Path):
+        """Load curated examples named <type>_report*.txt as approved reports."""
+        seed_dir = Path(seed_dir)
+        if not seed_dir.is_dir():
+            return
+        for p in sorted(seed_dir.glob("*.txt")):
+            alert_type = p.stem.split("_report", 1)[0]
+            self.add(report_body(p.read_text(encoding="utf-8")), alert_type,
+                     approved=True, source=f"seed:{p.name}")
+
+    def add(self, content, alert_type, customer="", case_id=None, approved=False, source="generated"):
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "INSERT INTO reports(alert_type, customer, case_id, approved, source, created_at, content) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalise_type(alert_type), customer or "", case_id, int(bool(approved)), source,
+                 time.time(), content))
+            return cur.lastrowid
+
+    def approve(self, content, alert_type, customer="", case_id=None):
+        """Mark a report approved; an edited report is stored as a new approved entry."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id FROM reports WHERE alert_type = ? AND content = ? ORDER BY id DESC LIMIT 1",
+                (normalise_type(alert_type), content)).fetchone()
+            if row:
+                self._db.execute("UPDATE reports SET approved = 1 WHERE id = ?", (row[0],))
+                return row[0]
+        return self.add(content, alert_type, customer, case_id, approved=True, source="approved")
+
+    def exemplars(self, alert_type, query_text="", limit=2, case_id=None):
+        """The best approved reports for this alert type, by text relevance and then the newest.
+
+        Reports of case_id itself are left out, so a case never gets its own report as an example."""
+        alert_type = normalise_type(alert_type)
+        if not alert_type:
+            return []
+        match = fts_query(query_text)
+        with self._lock:
+            rows = []
+            if match:
+                rows = self._db.execute(
+                    "SELECT r.content FROM reports_fts JOIN reports r ON r.id = reports_fts.rowid "
+                    "WHERE reports_fts MATCH ? AND r.alert_type = ? AND r.approved = 1 "
+                    "AND (r.case_id IS NULL OR r.case_id != ?) "
+                    "ORDER BY bm25(reports_fts) LIMIT ?",
+                    (match, alert_type, case_id or "", limit)).fetchall()
+            if len(rows) < limit:
+                seen = {r[0] for r in rows}
+                rows += [r for r in self._db.execute(
+                    "SELECT content FROM reports WHERE alert_type = ? AND approved = 1 "
+                    "AND (case_id IS NULL OR case_id != ?) "
+                    "ORDER BY created_at DESC LIMIT ?",
+                    (alert_type, case_id or "", limit + len(seen))).fetchall() if r[0] not in seen][:limit - len(rows)]
+        return [compact(r[0]) for r in rows]
+
+    def stats(self):
+        with self._lock:
+            total, approved = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(approved), 0) FROM reports").fetchone()
+        return {"reports": total, "approved": approved}
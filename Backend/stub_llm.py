@@ -0,0 +1,126 @@
+# stub_llm.py
+# Local OpenAI-compatible stand-in for tests, benchmarks and load tests.
+#
+# Serves /v1/chat/completions (plain and streamed) and /v1/embeddings with
+# configurable, per-model latency and no network access. Point the Backend at
+# it with:
+#   LLM_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python main.py
+#
+# STUB_LATENCY sets "model=first_token_s:total_s" pairs, e.g.
+#   STUB_LATENCY="gpt-5=8:20,gpt-5-mini=0.5:3"
+# STUB_FAIL lists models that answer every completion with HTTP 500, e.g.
+#   STUB_FAIL="gpt-5"
+import os
+import json
+import time
+import uuid
+import base64
+import struct
+import hashlib
+from flask import Flask, Response, request, jsonify
+
+STUB_DEFAULT_LATENCY = (0.2, 1.0)
+STUB_EMBEDDING_DIM = 256
+
+app = Flask(__name__)
+
+
+def parse_latency(spec):
+    latencies = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, timing = item.partition("=")
+        first, _, total = timing.partition(":")
+        latencies[model.strip()] = (float(first), float(total or first))
+    return latencies
+
+
+LATENCY = parse_latency(os.environ.get("STUB_LATENCY", ""))
+FAIL = {m.strip() for m in os.environ.get("STUB_FAIL", "").split(",") if m.strip()}
+
+
+def fake_report(prompt, model):
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    return (f"Title: Stub report {digest}\nDate: {time.strftime('%Y-%m-%d')}\n"
+            f"Alert Type/Category: Test\nSeverity: Low\nAnalyst Name:\nCase #:\n\n"
+            f"# DETECTION AND ANALYSIS\n\n## Alert Summary:\nGenerated by {model} for a "
+            f"{len(prompt)} character prompt.\n\n## Key Details:\nHost: STUB-01\n\n"
+            f"## Consequence:\nNone, this is a stub.\n\n# CONTAINMENT\n\n"
+            f"## Executed Remediation Actions:\n- None\n\n## Recommended Remediation Actions:\n- None\n")
+
+
+def fake_embedding(text):
+    # hashed bag of words, so similar texts still land near each other
+    vec = [0.0] * STUB_EMBEDDING_DIM
+    for word in text.lower().split():
+        vec[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % STUB_EMBEDDING_DIM] += 1.0
+    norm = sum(v * v for v in vec) ** 0.5 or 1.0
+    return [v / norm for v in vec]
+
+
+@app.post("/v1/chat/completions")
+def chat_completions():
+    body = request.get_json(force=True) or {}
+    model = body.get("model", "stub")
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if model in FAIL:
+        return jsonify({"error": {"message": f"{model} is failing (STUB_FAIL)", "type": "server_error"}}), 500
+    first_s, total_s = LATENCY.get(model, STUB_DEFAULT_LATENCY)
+    text = fake_report(prompt, model)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        time.sleep(total_s)
+        return jsonify({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                      "total_tokens": (len(prompt) + len(text)) // 4},
+        })
+
+    def chunk(delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    def generate():
+        # like the real API: headers and the role chunk right away, content after first_s
+        yield chunk({"role": "assistant", "content": ""})
+        time.sleep(first_s)
+        lines = text.splitlines(keepends=True)
+        per_line = max(0.0, total_s - first_s) / max(1, len(lines))
+        for line in lines:
+            yield chunk({"content": line})
+            time.sleep(per_line)
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+def embeddings():
+    body = request.get_json(force=True) or {}
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    def encode(vec):
+        # the openai client asks for base64-packed float32 unless told otherwise
+        if body.get("encoding_format") == "base64":
+            return base64.b64encode(struct.pack(f"<{len(vec)}f", *vec)).decode("ascii")
+        return vec
+
+    return jsonify({
+        "object": "list",
+        "model": body.get("model", "stub-embedding"),
+        "data": [{"object": "embedding", "index": i, "embedding": encode(fake_embedding(str(text)))}
+                 for i, text in enumerate(inputs)],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    })
+
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=int(os.environ.get("STUB_PORT", "8001")), threaded=True)
@@ -0,0 +1,160 @@
+# alert_groups.py
+# Collapse correlated alerts into one group, so an alert storm becomes one card and one report.
+#
+# Two alert payloads land in the same group when they belong to the same customer,
+# share an entity (host, user, process chain or source IP) and their
+# first_event_time..last_event_time windows overlap (within ALERT_GROUP_SLACK_S).
+# Grouping is transitive. Per entity the payloads are sorted by window start
+# and swept once, so the cost stays O(n log n) however large the storm is.
+import os
+from datetime import datetime, timezone, timedelta
+
+ALERT_GROUP_SLACK_S = int(os.environ.get("ALERT_GROUP_SLACK_S", "3600"))
+
+# Values that show up in unrelated alerts and must not link them
+IGNORED_ENTITIES = {"nt authority\\system", "system", "local service", "network service",
+                    "localhost", "127.0.0.1", "::1", "0.0.0.0"}
+SEVERITY_RANK = {"informational": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+
+
+def parse_time(value):
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        t = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+
+
+def alert_objects(payload):
+    """The alert entries of a payload (the Customer entry and the like are left out)."""
+    items = payload if isinstance(payload, list) else [payload]
+    return [it for it in items if isinstance(it, dict) and it.get("alert_id")]
+
+
+def customer_of(payload):
+    items = payload if isinstance(payload, list) else [payload]
+    for it in items:
+        if isinstance(it, dict) and isinstance(it.get("Customer"), dict):
+            return str(it["Customer"].get("name") or "").strip().lower()
+    return ""
+
+
+def _name(value):
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("path")
+    if not isinstance(value, str) or not value.strip():
+        return ""
+    return value.strip().replace("/", "\\").rsplit("\\", 1)[-1].lower()
+
+
+def _user(value):
+    user = str(value or "").strip().lower()
+    if user in IGNORED_ENTITIES:
+        return ""
+    # DOMAIN\user and user@domain are the same account
+    return user.rsplit("\\", 1)[-1].split("@", 1)[0]
+
+
+def _host(value):
+    host = str(value or "").strip().lower()
+    if host in IGNORED_ENTITIES:
+        return ""
+    return host.split(".", 1)[0]  # WS-072.datahaven.local == WS-072
+
+
+def entity_keys(alert):
+    """Entities of one alert as ("kind", value) pairs."""
+    entities = alert.get("entities") or {}
+    keys = set()
+    for field in ("host", "origin_host"):
+        if _host(entities.get(field)):
+            keys.add(("host", _host(entities.get(field))))
+    if _user(entities.get("user")):
+        keys.add(("user", _user(entities.get("user"))))
+    for ip in entities.get("source_ips") or []:
+        if str(ip).strip() and str(ip).strip() not in IGNORED_ENTITIES:
+            keys.add(("ip", str(ip).strip()))
+    # a process chain links alerts, a common process name on its own (powershell.exe) does not
+    process = entities.get("process") if isinstance(entities.get("process"), dict) else {}
+    chains = [(entities.get("parent_process"), entities.get("child_process")),
+              (process.get("parent_process"), process.get("path"))]
+    for parent, child in chains:
+        if _name(parent) and _name(child):
+            keys.add(("process", f"{_name(parent)}>{_name(child)}"))
+    return keys
+
+
+def alert_window(alert):
+    """(start, end) of the activity behind an alert, from its metadata or detected_time."""
+    meta = alert.get("metadata") or {}
+    start = parse_time(meta.get("first_event_time")) or parse_time(alert.get("detected_time"))
+    end = parse_time(meta.get("last_event_time")) or parse_time(alert.get("detected_time")) or start
+    if start is None:
+        return None
+    return (start, max(start, end))
+
+
+def payload_window(payload):
+    windows = [w for w in (alert_window(a) for a in alert_objects(payload)) if w]
+    if not windows:
+        return None
+    return (min(w[0] for w in windows), max(w[1] for w in windows))
+
+
+def severity_rank(severity):
+    return SEVERITY_RANK.get(str(severity or "").strip().lower(), -1)
+
+
+def group_payloads(payloads, slack_s=None):
+    """Group indexes of payloads into correlated groups, in order of each group's first payload."""
+    slack = timedelta(seconds=ALERT_GROUP_SLACK_S if slack_s is None else slack_s)
+    parent = list(range(len(payloads)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    windows = [payload_window(p) for p in payloads]
+    by_entity = {}
+    for i, payload in enumerate(payloads):
+        if windows[i] is None:
+            continue  # without a time window there is nothing to correlate on
+        customer = customer_of(payload)
+        for alert in alert_objects(payload):
+            for key in entity_keys(alert):
+                by_entity.setdefault((customer, key), set()).add(i)
+
+    for members in by_entity.values():
+        if len(members) < 2:
+            continue
+        ordered = sorted(members, key=lambda i: windows[i][0])
+        anchor = ordered[0]
+        reach = windows[anchor][1]
+        for i in ordered[1:]:
+            start, end = windows[i]
+            if start <= reach + slack:
+                parent[find(i)] = find(anchor)
+                reach = max(reach, end)
+            else:
+                anchor, reach = i, end
+
+    groups = {}
+    for i in range(len(payloads)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda g: g[0])
+
+
+def merge_payloads(payloads):
+    """One payload for a whole group: the first payload as is, then the other payloads' alerts."""
+    merged = list(payloads[0]) if isinstance(payloads[0], list) else [payloads[0]]
+    seen = {a.get("alert_id") for a in alert_objects(merged)}
+    for payload in payloads[1:]:
+        for alert in alert_objects(payload):
+            if alert.get("alert_id") not in seen:
+                seen.add(alert.get("alert_id"))
+                merged.append(alert)
+    return merged
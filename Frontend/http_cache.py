@@ -0,0 +1,94 @@
+# http_cache.py
+# Cheaper page responses: templates compiled once, gzip for large text
+# responses, and ETag/conditional GET so unchanged pages cost a 304.
+#
+# Routes register their inline template strings with register_template() at
+# import time and render them with render_cached(); init_http_cache(app)
+# compiles all of them at startup and installs the compression hook.
+import gzip
+import hashlib
+from flask import Response, current_app, request
+
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+GZIP_MIMETYPES = {"text/html", "text/plain", "text/css", "application/json", "application/javascript"}
+
+_registered: list[str] = []
+_compiled = {}
+_template_version = ""
+
+
+def register_template(source: str) -> str:
+    """Mark an inline template for compilation at startup; returns it unchanged."""
+    _registered.append(source)
+    return source
+
+
+def _compile(app, source):
+    template = _compiled.get(source)
+    if template is None:
+        template = _compiled[source] = app.jinja_env.from_string(source)
+    return template
+
+
+def render_cached(source: str, **context) -> str:
+    """render_template_string without re-parsing the template on every request."""
+    app = current_app._get_current_object()
+    template = _compile(app, source)
+    app.update_template_context(context)
+    return template.render(context)
+
+
+def etag_for(*parts) -> str:
+    """ETag over the page's inputs plus the template version, so a redeploy changes it too."""
+    h = hashlib.sha1(_template_version.encode("utf-8"))
+    for part in parts:
+        h.update(b"\0")
+        h.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+def not_modified(etag: str):
+    """A 304 response when the client already has this ETag (either encoding), else None."""
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(f"{etag}-gz"):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+    return None
+
+
+def with_etag(body, etag: str, status: int = 200) -> Response:
+    resp = Response(body, status=status, mimetype="text/html")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"  # always revalidate, but a match costs a 304
+    return resp
+
+
+def _compress(response):
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in GZIP_MIMETYPES
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "").lower()):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag:
+        # a different byte representation needs its own validator
+        response.set_etag(f"{etag}-gz", weak=weak)
+    return response
+
+
+def init_http_cache(app):
+    global _template_version
+    for source in _registered:
+        _compile(app, source)
+    _template_version = hashlib.sha1("\0".join(_registered).encode("utf-8")).hexdigest()
+    app.after_request(_compress)
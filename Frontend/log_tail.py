@@ -0,0 +1,126 @@
+# log_tail.py
+# Follow mode for log CSVs that are still being written (e.g. an ongoing EDR export).
+#
+# Each CSV gets one CsvTail that remembers the byte offset it has parsed up to.
+# refresh() reads only the bytes appended since then, parses the complete
+# records among them and keeps the raw lines and parsed rows in memory, so a
+# page view or a new row costs the same however large the file has grown.
+# A record is complete once it ends in a newline outside a quoted field; the
+# unfinished remainder is re-read on the next refresh.
+import io
+import re
+import csv
+import threading
+from pathlib import Path
+
+FOLLOW_POLL_S = 0.5
+FOLLOW_HEARTBEAT_S = 15.0
+
+_RECORD_DELIMS = re.compile(rb'["\n]')
+
+
+def complete_prefix(buf: bytes) -> tuple[int, bool]:
+    """Length of buf up to the last record-ending newline, and whether buf ends inside quotes."""
+    in_quotes = False
+    end = 0
+    for m in _RECORD_DELIMS.finditer(buf):
+        if m.group() == b'"':
+            in_quotes = not in_quotes  # "" inside a field toggles twice
+        elif not in_quotes:
+            end = m.end()
+    return end, in_quotes
+
+
+def split_lines(text: str) -> list[str]:
+    # same line splitting as read_csv_lines_as_text
+    return [raw.rstrip("\r\n") for raw in io.StringIO(text, newline="")]
+
+
+class CsvTail:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.generation = 0  # bumped whenever the file is re-read from the start
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0       # bytes parsed into lines/rows
+        self.identity = None  # (inode, size, mtime) at the last refresh
+        self.headers: list[str] = []
+        self.lines: list[str] = []
+        self.rows: list[list[str]] = []
+        self.pending = b""    # appended bytes that do not end a record yet
+
+    def refresh(self) -> bool:
+        """Parse whatever was appended since the last call. Returns True if anything changed."""
+        with self.lock:
+            st = self.path.stat()
+            identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if identity == self.identity:
+                return False
+            # truncated, replaced or rewritten in place: start over
+            if (self.identity is not None
+                    and (st.st_ino != self.identity[0] or st.st_size < self.offset
+                         or st.st_size == self.identity[1])):
+                self._reset()
+                self.generation += 1
+            self.identity = identity
+
+            with self.path.open("rb") as fh:
+                fh.seek(self.offset)
+                buf = fh.read(st.st_size - self.offset)
+            end, _ = complete_prefix(buf)
+            self.pending = buf[end:]
+            if end:
+                self.offset += end
+                self._append(buf[:end].decode("utf-8"))
+            return True
+
+    def _append(self, text):
+        self.lines.extend(split_lines(text))
+        rows = list(csv.reader(io.StringIO(text, newline="")))
+        if not self.headers and rows:
+            self.headers = rows.pop(0)
+        self.rows.extend(rows)
+
+    def snapshot(self):
+        """(headers, lines, rows, committed_lines, committed_rows) for rendering a page.
+
+        A trailing record without its newline is included when it is not cut inside a quoted
+        field; the committed counts tell a follower where the next pushed rows start."""
+        with self.lock:
+            headers, lines, rows = self.headers, list(self.lines), list(self.rows)
+            committed = (len(lines), len(rows))
+            _, in_quotes = complete_prefix(self.pending)
+            if self.pending and not in_quotes:
+                text = self.pending.decode("utf-8", errors="ignore")
+                lines += split_lines(text)
+                tail_rows = list(csv.reader(io.StringIO(text, newline="")))
+                if not headers and tail_rows:
+                    headers = tail_rows.pop(0)
+                rows += tail_rows
+        return headers, lines, rows, committed[0], committed[1]
+
+    def size(self):
+        """(committed lines, committed bytes), without copying anything."""
+        with self.lock:
+            return len(self.lines), self.offset
+
+    def since(self, line_start: int, row_start: int):
+        """Committed lines and rows from the given indexes on."""
+        with self.lock:
+            return self.lines[line_start:], self.rows[row_start:]
+
+
+_tails: dict[Path, CsvTail] = {}
+_tails_lock = threading.Lock()
+
+
+def tail_for(path: Path) -> CsvTail:
+    path = Path(path).resolve()
+    with _tails_lock:
+        tail = _tails.get(path)
+        if tail is None:
+            tail = _tails[path] = CsvTail(path)
+    tail.refresh()
+    return tail
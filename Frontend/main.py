@@ -1,11 +1,18 @@
 # app.py
 from flask import Flask, jsonify, request, render_template_string
 from pathlib import Path
+import sys
 from routes import alerts_bp, logs_bp,analysis_bp
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))  # helpers shared with the Backend
+from profiling import init_profiling
+from http_cache import init_http_cache
+
 app = Flask(__name__)
 app.register_blueprint(alerts_bp)
 app.register_blueprint(logs_bp)
 app.register_blueprint(analysis_bp)
+init_http_cache(app)
+init_profiling(app, paths=("/analysis/initial-analysis", "/analysis/export-pdf", "/logs/"))
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -1,76 +1,15 @@
-from flask import Blueprint, jsonify, request, render_template_string
+from flask import Blueprint, jsonify, request
 from pathlib import Path
 import json
+from http_cache import register_template, render_cached, etag_for, not_modified, with_etag
+from alert_groups import group_payloads, merge_payloads, payload_window, severity_rank
 
 alerts_bp = Blueprint("alerts", __name__, url_prefix="/")
 
 # SAME path as before — no discovery, no changes
 DATA_DIR = Path("RagData/alert").resolve()
 
-@alerts_bp.get("/")
-def index():
-    def extract_meta(payload):
-        customer_name = None
-        alert_name = None
-        severity = None
-
-        if isinstance(payload, list):
-            for obj in payload:
-                if not isinstance(obj, dict):
-                    continue
-
-                # First Customer.name
-                if customer_name is None and "Customer" in obj and isinstance(obj["Customer"], dict):
-                    val = obj["Customer"].get("name")
-                    if isinstance(val, str) and val.strip():
-                        customer_name = val.strip()
-
-                # First alert_name
-                if alert_name is None and "alert_name" in obj:
-                    val = obj.get("alert_name")
-                    if isinstance(val, str) and val.strip():
-                        alert_name = val.strip()
-
-                # First non-null/non-empty severity
-                if severity is None and "severity" in obj:
-                    val = obj.get("severity")
-                    if isinstance(val, str):
-                        if val.strip():
-                            severity = val.strip()
-                    elif val is not None:
-                        severity = val
-
-                # Early exit if we’ve found everything
-                if customer_name is not None and alert_name is not None and severity is not None:
-                    break
-
-        return customer_name, alert_name, severity
-
-    alerts = []
-    for p in sorted(DATA_DIR.glob("*.json")):
-        try:
-            with p.open("r", encoding="utf-8") as f:
-                payload = json.load(f)
-            customer_name, alert_name, severity = extract_meta(payload)
-            alerts.append({
-                # display_name becomes the card title (alert_name preferred)
-                "display_name": alert_name or p.stem,
-                # keep filename for slug/nav logic
-                "filename": p.name,
-                "payload": payload,
-                "customer_name": customer_name,
-                "severity": severity
-            })
-        except Exception as e:
-            alerts.append({
-                "display_name": f"{p.name} (failed to load: {e})",
-                "filename": p.name,
-                "payload": None,
-                "customer_name": None,
-                "severity": None
-            })
-
-    tmpl = """
+ALERTS_TMPL = register_template("""
     <!doctype html>
     <html lang="en">
     <head>
@@ -122,6 +61,14 @@ def index():
             const sev = textOrFallback(item.severity, "unknown");
             meta.textContent = who + " · Severity: " + sev;
 
+            // a group of correlated alerts is one card and one report
+            let members = null;
+            if (Array.isArray(item.members) && item.members.length > 1){
+              members = document.createElement("div");
+              members.className = "muted";
+              members.textContent = item.members.length + " correlated alerts: " + item.members.join(", ");
+            }
+
             const btn = document.createElement("button");
             btn.className = "btn";
             btn.textContent = "Open";
@@ -141,6 +88,7 @@ def index():
 
             card.appendChild(h3);
             card.appendChild(meta);
+            if (members) card.appendChild(members);
             card.appendChild(btn);
             return card;
           }
@@ -158,8 +106,104 @@ def index():
       </script>
     </body>
     </html>
-    """
-    return render_template_string(tmpl, alerts=alerts, data_dir=str(DATA_DIR))
+    """)
+
+
+def extract_meta(payload):
+    customer_name = None
+    alert_name = None
+    severity = None
+
+    if isinstance(payload, list):
+        for obj in payload:
+            if not isinstance(obj, dict):
+                continue
+
+            # First Customer.name
+            if customer_name is None and "Customer" in obj and isinstance(obj["Customer"], dict):
+                val = obj["Customer"].get("name")
+                if isinstance(val, str) and val.strip():
+                    customer_name = val.strip()
+
+            # First alert_name
+            if alert_name is None and "alert_name" in obj:
+                val = obj.get("alert_name")
+                if isinstance(val, str) and val.strip():
+                    alert_name = val.strip()
+
+            # First non-null/non-empty severity
+            if severity is None and "severity" in obj:
+                val = obj.get("severity")
+                if isinstance(val, str):
+                    if val.strip():
+                        severity = val.strip()
+                elif val is not None:
+                    severity = val
+
+            # Early exit if we’ve found everything
+            if customer_name is not None and alert_name is not None and severity is not None:
+                break
+
+    return customer_name, alert_name, severity
+
+
+def group_cards(alerts):
+    """One card per group of correlated alerts.
+
+    The card opens the group's primary alert (highest severity, then earliest) with a payload
+    holding every alert of the group, so the whole group gets a single report."""
+    loaded = [a for a in alerts if a["payload"] is not None]
+    cards = []
+    for group in group_payloads([a["payload"] for a in loaded]):
+        members = [loaded[i] for i in group]
+        if len(members) == 1:
+            cards.append(members[0])
+            continue
+        members.sort(key=lambda a: (-severity_rank(a["severity"]), payload_window(a["payload"])[0]))
+        primary = members[0]
+        cards.append({
+            **primary,
+            "payload": merge_payloads([a["payload"] for a in members]),
+            "members": [a["display_name"] for a in members],
+        })
+    return cards + [a for a in alerts if a["payload"] is None]
+
+
+@alerts_bp.get("/")
+def index():
+    files = sorted(DATA_DIR.glob("*.json"))
+    # the page only changes when an alert file does
+    etag = etag_for([(p.name, p.stat().st_mtime_ns, p.stat().st_size) for p in files])
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    alerts = []
+    for p in files:
+        try:
+            with p.open("r", encoding="utf-8") as f:
+                payload = json.load(f)
+            customer_name, alert_name, severity = extract_meta(payload)
+            alerts.append({
+                # display_name becomes the card title (alert_name preferred)
+                "display_name": alert_name or p.stem,
+                # keep filename for slug/nav logic
+                "filename": p.name,
+                "payload": payload,
+                "customer_name": customer_name,
+                "severity": severity
+            })
+        except Exception as e:
+            alerts.append({
+                "display_name": f"{p.name} (failed to load: {e})",
+                "filename": p.name,
+                "payload": None,
+                "customer_name": None,
+                "severity": None
+            })
+
+    body = render_cached(ALERTS_TMPL, alerts=group_cards(alerts), data_dir=str(DATA_DIR))
+    return with_etag(body, etag)
 
 
 @alerts_bp.post("/json_test")
@@ -1,15 +1,24 @@
-from flask import Blueprint, jsonify, request, render_template_string, current_app, Response
+from flask import Blueprint, jsonify, request, current_app, Response
 from pathlib import Path
 import json
 import copy
 import requests
 from datetime import datetime
+from collections import OrderedDict
 import io
+import re
+import itertools
+import queue
+import hashlib
+import zipfile
+import threading
 import markdown as md
 from playwright.sync_api import sync_playwright
+from http_cache import register_template, render_cached
 
 JSON_PAYLOAD = ""
 INITIAL_ANALYSIS = ""
+BACKEND_URL = "http://127.0.0.1:8000"
 analysis_bp = Blueprint("analysis", __name__, url_prefix="/analysis")
 
 PDF_CSS = """
@@ -35,49 +44,136 @@ hr { border: none; border-top: 1px solid #ddd; margin: 12px 0; }
 }
 """
 
-def markdown_to_pdf(markdown_text: str) -> bytes:
-    # MD -> HTML
-    html_body = md.markdown(
-        markdown_text,
-        extensions=["extra", "sane_lists", "toc", "smarty", "nl2br"]
-    )
+PDF_OPTIONS = {
+    "format": "A4",
+    "print_background": True,
+    "margin": {"top": "24mm", "right": "18mm", "bottom": "24mm", "left": "18mm"},
+}
+MD_EXTENSIONS = ["extra", "sane_lists", "toc", "smarty", "nl2br"]
+
+# Rendered PDFs keyed by content hash: small in-memory LRU in front of a disk cache
+PDF_CACHE_DIR = Path("outputs/pdf_cache")
+PDF_CACHE_MEMORY_ITEMS = 32
+PDF_CACHE_DISK_ITEMS = 500
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+# Building a Markdown converter loads every extension; build it once and reset per use
+_md_converter = md.Markdown(extensions=MD_EXTENSIONS)
+_md_lock = threading.Lock()
+
 
-    # Extract Title/Date if present
-    title = "Incident Report"
-    date_str = datetime.now().strftime("%Y-%m-%d")
+def report_header(markdown_text: str):
+    """Title and Date lines of a report; the date is "" when the report has none."""
+    title, date_str = "Incident Report", ""
     for line in markdown_text.splitlines():
         low = line.strip().lower()
         if low.startswith("title:"):
             title = line.split(":", 1)[1].strip() or title
         elif low.startswith("date:"):
             date_str = line.split(":", 1)[1].strip() or date_str
+    return title, date_str
+
+
+def markdown_to_section(markdown_text: str):
+    """Render one report to (title, html) where html is its header plus body."""
+    # MD -> HTML
+    with _md_lock:
+        html_body = _md_converter.reset().convert(markdown_text)
+
+    title, date_str = report_header(markdown_text)
+    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+    return title, f"""<div class="header">
+    <div><strong>{title}</strong></div>
+    <div class="small">{date_str}</div>
+  </div>
+  {html_body}"""
+
 
-    full_html = f"""<!doctype html>
+def wrap_pdf_html(title: str, body: str) -> str:
+    return f"""<!doctype html>
 <html><head>
   <meta charset="utf-8">
   <title>{title}</title>
   <style>{PDF_CSS}</style>
 </head>
 <body>
-  <div class="header">
-    <div><strong>{title}</strong></div>
-    <div class="small">{date_str}</div>
-  </div>
-  {html_body}
+  {body}
 </body></html>"""
 
+
+def markdown_to_html(markdown_text: str) -> str:
+    title, section = markdown_to_section(markdown_text)
+    return wrap_pdf_html(title, section)
+
+
+def html_to_pdf(full_html: str, page) -> bytes:
+    # Ensure fonts & sizing match print layout
+    page.set_content(full_html, wait_until="load")
+    return page.pdf(**PDF_OPTIONS)
+
+
+def pdf_cache_key(markdown_text: str) -> str:
+    h = hashlib.sha256()
+    h.update(markdown_text.encode("utf-8"))
+    h.update(json.dumps(PDF_OPTIONS, sort_keys=True).encode("utf-8"))
+    h.update(PDF_CSS.encode("utf-8"))
+    # only reports without a Date: line are stamped with today's date
+    if not report_header(markdown_text)[1]:
+        h.update(datetime.now().strftime("%Y-%m-%d").encode("utf-8"))
+    return h.hexdigest()
+
+
+def pdf_cache_get(key: str):
+    with _pdf_cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            return _pdf_cache[key]
+    path = PDF_CACHE_DIR / f"{key}.pdf"
+    try:
+        pdf_bytes = path.read_bytes()
+    except OSError:
+        return None
+    _pdf_cache_remember(key, pdf_bytes)
+    return pdf_bytes
+
+
+def _pdf_cache_remember(key: str, pdf_bytes: bytes):
+    with _pdf_cache_lock:
+        _pdf_cache[key] = pdf_bytes
+        _pdf_cache.move_to_end(key)
+        while len(_pdf_cache) > PDF_CACHE_MEMORY_ITEMS:
+            _pdf_cache.popitem(last=False)
+
+
+def pdf_cache_put(key: str, pdf_bytes: bytes):
+    _pdf_cache_remember(key, pdf_bytes)
+    try:
+        PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = PDF_CACHE_DIR / f"{key}.{threading.get_ident()}.tmp"
+        tmp.write_bytes(pdf_bytes)
+        tmp.replace(PDF_CACHE_DIR / f"{key}.pdf")
+        cached = sorted(PDF_CACHE_DIR.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+        for old in cached[:-PDF_CACHE_DISK_ITEMS]:
+            old.unlink(missing_ok=True)
+    except OSError:
+        pass  # the disk cache is best effort
+
+
+def markdown_to_pdf(markdown_text: str) -> bytes:
+    key = pdf_cache_key(markdown_text)
+    cached = pdf_cache_get(key)
+    if cached is not None:
+        return cached
+
+    full_html = markdown_to_html(markdown_text)
+
     # HTML -> PDF with headless Chromium
-    with sync_playwright() as p:
+    with _browser_slots, sync_playwright() as p:
         browser = p.chromium.launch()
-        page = browser.new_page()
-        # Ensure fonts & sizing match print layout
-        page.set_content(full_html, wait_until="load")
-        pdf_bytes = page.pdf(
-            format="A4",
-            print_background=True,
-            margin={"top": "24mm", "right": "18mm", "bottom": "24mm", "left": "18mm"}
-        )
+        pdf_bytes = html_to_pdf(full_html, browser.new_page())
         browser.close()
+    pdf_cache_put(key, pdf_bytes)
     return pdf_bytes
 
 @analysis_bp.post("/export-pdf")
@@ -89,6 +185,7 @@ def export_pdf():
             content = str(content)
 
         pdf_bytes = markdown_to_pdf(content)
+        approve_report(content)
         filename = f'llm_suggestion_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
         return Response(
             pdf_bytes,
@@ -101,6 +198,155 @@ def export_pdf():
             hint = " (Did you run: python -m playwright install chromium ?)"
         return jsonify({"error": f"failed_to_export_pdf: {e}{hint}"}), 400
 
+# At most this many Chromium instances run at once, across all requests of the process
+BUNDLE_MAX_WORKERS = 4
+BUNDLE_MAX_REPORTS = 200
+_browser_slots = threading.BoundedSemaphore(BUNDLE_MAX_WORKERS)
+
+
+class _ZipStream:
+    """Write-only sink for zipfile; the bytes are drained after every entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def render_pdfs_parallel(jobs):
+    """Render (name, html, cache_key) jobs across a bounded pool of browsers.
+
+    Every browser holds one of the process-wide _browser_slots, so concurrent bundles
+    share BUNDLE_MAX_WORKERS browsers instead of starting that many each.
+    Yields (name, pdf_bytes, error) in completion order, not input order."""
+    todo = queue.Queue()
+    done = queue.Queue()
+    for job in jobs:
+        todo.put(job)
+    total = todo.qsize()
+
+    def worker():
+        with _browser_slots:
+            if todo.empty():
+                return  # the other workers finished the jobs while this one waited
+            run_browser()
+
+    def run_browser():
+        try:
+            with sync_playwright() as p:
+                browser = p.chromium.launch()
+                page = browser.new_page()
+                while True:
+                    try:
+                        name, html, key = todo.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        pdf_bytes = html_to_pdf(html, page)
+                        if key:
+                            pdf_cache_put(key, pdf_bytes)
+                        done.put((name, pdf_bytes, None))
+                    except Exception as e:
+                        done.put((name, None, e))
+                browser.close()
+        except Exception as e:
+            # browser failed to start; fail whatever this worker would have taken
+            while True:
+                try:
+                    name, _, _ = todo.get_nowait()
+                except queue.Empty:
+                    break
+                done.put((name, None, e))
+
+    for _ in range(min(BUNDLE_MAX_WORKERS, total)):
+        threading.Thread(target=worker, daemon=True).start()
+    for _ in range(total):
+        yield done.get()
+
+
+def bundle_entry_name(index: int, name: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._") or "report"
+    if safe.lower().endswith(".pdf"):
+        safe = safe[:-4]
+    return f"{index + 1:03d}_{safe[:80]}.pdf"
+
+
+@analysis_bp.post("/export-bundle")
+def export_bundle():
+    """Export many reports as one ZIP, streamed as each PDF finishes.
+
+    Body: {"reports": [{"name": ..., "content": <markdown>} | <markdown>, ...],
+           "merge": true}  -- merge also adds all reports as one merged.pdf."""
+    data = request.get_json(force=True, silent=True) or {}
+    reports = data.get("reports")
+    if not isinstance(reports, list) or not reports:
+        return jsonify({"error": "reports must be a non-empty list"}), 400
+    if len(reports) > BUNDLE_MAX_REPORTS:
+        return jsonify({"error": f"at most {BUNDLE_MAX_REPORTS} reports per bundle"}), 400
+
+    entries = []
+    for i, item in enumerate(reports):
+        if isinstance(item, dict):
+            content = str(item.get("content", ""))
+            name = str(item.get("name") or "")
+        else:
+            content, name = str(item), ""
+        title, section = markdown_to_section(content)
+        entries.append((bundle_entry_name(i, name or title), content, title, section))
+
+    cached, jobs = [], []
+    for entry_name, content, title, section in entries:
+        key = pdf_cache_key(content)
+        pdf_bytes = pdf_cache_get(key)
+        if pdf_bytes is not None:
+            cached.append((entry_name, pdf_bytes, None))
+        else:
+            jobs.append((entry_name, wrap_pdf_html(title, section), key))
+    if data.get("merge"):
+        page_break = '<div style="page-break-before: always"></div>'
+        merged_body = page_break.join(section for _, _, _, section in entries)
+        jobs.append(("merged.pdf", wrap_pdf_html("Report bundle", merged_body), None))
+
+    def generate():
+        sink = _ZipStream()
+        errors = []
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for entry_name, pdf_bytes, error in itertools.chain(cached, render_pdfs_parallel(jobs)):
+                if error is not None:
+                    errors.append(f"{entry_name}: {error}")
+                else:
+                    zf.writestr(entry_name, pdf_bytes)
+                yield sink.drain()
+            if errors:
+                zf.writestr("errors.txt", "\n".join(errors) + "\n")
+        yield sink.drain()
+
+    filename = f'llm_reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+    return Response(
+        generate(),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def case_id_for(alert_payload):
+    """Case key for an alert payload: the first alert_id in it."""
+    items = alert_payload if isinstance(alert_payload, list) else [alert_payload]
+    for it in items:
+        if isinstance(it, dict) and it.get("alert_id"):
+            return str(it["alert_id"])
+    return ""
+
+
 def build_json_payload_for_llm():
     try:
         jp = globals().get("JSON_PAYLOAD", {}) or {}
@@ -112,6 +358,7 @@ def build_json_payload_for_llm():
         if not isinstance(siem_alert, dict):
             siem_alert = {"raw": siem_alert}
         envelope = {
+            "case_id": case_id_for(jp.get("last_json_body")),
             "log_lines": log_lines,
             "siem_alert": siem_alert,
             "initial_analysis": str(ia) if ia is not None else ""
@@ -123,11 +370,24 @@ def build_json_payload_for_llm():
             "error": f"build_siem_envelope_failed: {e.__class__.__name__}: {e}"
         }
 
-@analysis_bp.route("/", methods=["GET"])
-def analysis_form():
+
+def approve_report(content):
+    """An exported report counts as analyst-approved: hand it to the Backend's report library."""
     envelope = build_json_payload_for_llm()
-    slug = request.args.get("slug", "")  # for "Back to logs"
-    html = """
+    if not content.strip() or not envelope.get("siem_alert"):
+        return
+
+    def send():
+        try:
+            requests.post(f"{BACKEND_URL}/reports/approve",
+                          json={"content": content, "siem_alert": envelope["siem_alert"],
+                                "case_id": envelope.get("case_id", "")}, timeout=60)
+        except requests.RequestException as e:
+            print(f"approving report failed: {e}")
+
+    threading.Thread(target=send, daemon=True).start()
+
+ANALYSIS_TMPL = register_template("""
     <!doctype html>
     <html lang="en">
     <head>
@@ -157,9 +417,26 @@ def analysis_form():
             <label for="llm_suggestion">LLM suggestion</label>
             <textarea id="llm_suggestion" name="llm_suggestion" rows="8"
               placeholder="Paste a suggested response or remediation from an LLM here..."></textarea>
+            <div id="llm_model" class="muted"></div>
+
+            <label style="display:inline-flex;gap:.35rem;align-items:center;margin:.25rem 0 .5rem;">
+              <input id="parallel_sections" type="checkbox"> Generate sections in parallel (faster)
+            </label>
 
             <button id="generate-btn" class="btn" type="submit">Generate Draft</button>
             <button id="export-btn" class="btn" type="button" style="margin-left:.5rem;">Generate PDF</button>
+
+            <div style="margin-top:.75rem;">
+              <select id="section_select">
+                <option value="header">Header (title, date, severity)</option>
+                <option value="alert_summary">Alert Summary</option>
+                <option value="key_details">Key Details</option>
+                <option value="consequence">Consequence</option>
+                <option value="executed_remediation">Executed Remediation Actions</option>
+                <option value="recommended_remediation">Recommended Remediation Actions</option>
+              </select>
+              <button id="section-btn" class="btn secondary" type="button">Regenerate section</button>
+            </div>
           </form>
         </div>
       </div>
@@ -172,6 +449,17 @@ def analysis_form():
     const llmTa = document.getElementById('llm_suggestion');
     const exportBtn = document.getElementById('export-btn');
     const backLink = document.getElementById('backLink');
+    const parallelCb = document.getElementById('parallel_sections');
+    const sectionSel = document.getElementById('section_select');
+    const sectionBtn = document.getElementById('section-btn');
+    const modelNote = document.getElementById('llm_model');
+
+    // the Backend may fall back to a faster model, so say which one(s) wrote the text
+    let draftModels = new Set();
+    function showModel(model) {
+      (model || '').split(',').filter(Boolean).forEach(m => draftModels.add(m));
+      modelNote.textContent = draftModels.size ? 'Written by ' + [...draftModels].join(', ') : '';
+    }
 
     // If ?slug=... exists, point Back to that logs page
     const params = new URLSearchParams(window.location.search);
@@ -181,7 +469,7 @@ def analysis_form():
     }
 
     form.addEventListener('submit', async function () {
-      const payload = { initial_analysis: ta.value };
+      const payload = { initial_analysis: ta.value, mode: parallelCb.checked ? 'sections' : 'full' };
       btn.disabled = true;
       const original = btn.textContent;
       btn.textContent = 'Generating draft…';
@@ -198,6 +486,8 @@ def analysis_form():
 
         if (typeof data.llm_suggestion === 'string') {
           llmTa.value = data.llm_suggestion;
+          draftModels = new Set();
+          showModel(data.model);
         }
 
         btn.textContent = 'Saved!';
@@ -209,6 +499,34 @@ def analysis_form():
       }
     });
 
+    sectionBtn.addEventListener('click', async function () {
+      if (!llmTa.value.trim()) {
+        alert('Generate a draft first.');
+        return;
+      }
+      const original = sectionBtn.textContent;
+      sectionBtn.textContent = 'Regenerating…';
+      sectionBtn.disabled = true;
+      try {
+        const res = await fetch('/analysis/regenerate-section', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ initial_analysis: ta.value, section: sectionSel.value, draft: llmTa.value })
+        });
+        const data = await res.json().catch(() => ({}));
+        if (!res.ok) throw new Error(data.error || res.statusText);
+        if (typeof data.llm_suggestion === 'string') {
+          llmTa.value = data.llm_suggestion;
+          showModel(data.model);
+        }
+      } catch (err) {
+        alert('Error regenerating section: ' + err.message);
+      } finally {
+        sectionBtn.textContent = original;
+        sectionBtn.disabled = false;
+      }
+    });
+
     exportBtn.addEventListener('click', async function () {
       const text = llmTa.value || '';
       if (!text.trim()) {
@@ -251,8 +569,14 @@ def analysis_form():
 </script>
     </body>
     </html>
-    """
-    return render_template_string(html, envelope=envelope, slug=slug)
+    """)
+
+
+@analysis_bp.route("/", methods=["GET"])
+def analysis_form():
+    envelope = build_json_payload_for_llm()
+    slug = request.args.get("slug", "")  # for "Back to logs"
+    return render_cached(ANALYSIS_TMPL, envelope=envelope, slug=slug)
 
 @analysis_bp.route("/initial-analysis", methods=["POST"])
 def send_analysis_to_llm():
@@ -264,13 +588,31 @@ def send_analysis_to_llm():
             text = request.form.get("initial_analysis", "")
         INITIAL_ANALYSIS = str(text or "")
         full_llm_request = build_json_payload_for_llm()
-        resp = requests.post("http://127.0.0.1:8000/llm", json=full_llm_request, timeout=1200)
+        full_llm_request["mode"] = "sections" if data.get("mode") == "sections" else "full"
+        resp = requests.post(f"{BACKEND_URL}/llm", json=full_llm_request, timeout=1200)
         resp.raise_for_status()
         llm_answer = resp.text
-        return jsonify({"status": "ok","initial_analysis": INITIAL_ANALYSIS,"llm_suggestion": llm_answer}), 200
+        return jsonify({"status": "ok","initial_analysis": INITIAL_ANALYSIS,"llm_suggestion": llm_answer,
+                        "model": resp.headers.get("X-Model", "")}), 200
     except Exception as e:
         return jsonify({"error": f"failed_to_set_initial_analysis: {e}"}), 400
 
+@analysis_bp.route("/regenerate-section", methods=["POST"])
+def regenerate_section():
+    global INITIAL_ANALYSIS
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get("initial_analysis") is not None:
+            INITIAL_ANALYSIS = str(data.get("initial_analysis") or "")
+        full_llm_request = build_json_payload_for_llm()
+        full_llm_request["section"] = data.get("section", "")
+        full_llm_request["draft"] = data.get("draft", "")
+        resp = requests.post(f"{BACKEND_URL}/llm/section", json=full_llm_request, timeout=1200)
+        resp.raise_for_status()
+        return jsonify({"status": "ok", "llm_suggestion": resp.text, "model": resp.headers.get("X-Model", "")}), 200
+    except Exception as e:
+        return jsonify({"error": f"failed_to_regenerate_section: {e}"}), 400
+
 @analysis_bp.route("/payload", methods=["POST"])
 def print_json_payload():
     try:
@@ -1,9 +1,16 @@
 # logs.py  (patched)
-from flask import Blueprint, jsonify, request, render_template_string
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from pathlib import Path
 import json
 import base64
+import hashlib
 import csv
+import time
+import threading
+import requests
+from .analysis import BACKEND_URL, case_id_for
+from http_cache import register_template, render_cached, etag_for, not_modified, with_etag
+from log_tail import tail_for, FOLLOW_POLL_S, FOLLOW_HEARTBEAT_S
 
 logs_bp = Blueprint("logs", __name__, url_prefix="/logs")
 
@@ -11,6 +18,7 @@ DATA_DIR = Path("RagData/logs").resolve()
 LAST_RAW_BODY = None
 LAST_JSON_BODY = None
 LAST_RAW_CONTENT_TYPE = None   # NEW
+LAST_BODY_DIGEST = None  # sha1 of LAST_RAW_BODY, part of the logs page ETag
 
 
 def csv_path_for_slug(slug: str) -> Path:
@@ -47,13 +55,7 @@ def parse_csv_for_table(path: Path, max_rows: int | None = None):
     return headers, rows
 
 
-@logs_bp.get("/<slug>")
-def show_slug(slug):
-    csv_path = csv_path_for_slug(slug)
-    if not csv_path.exists():
-        available = list_available_csvs()
-        return render_template_string(
-            """<!doctype html>
+LOGS_MISSING_TMPL = register_template("""<!doctype html>
 <html lang="en">
 <head>
   <meta charset="utf-8"><title>logs/{{ slug }} · Tier 0.5</title>
@@ -85,21 +87,9 @@ def show_slug(slug):
       </ul>
     </main>
   </body>
-</html>""",
-            slug=slug,
-            expected=f"{slug}_log.csv",
-            available=available
-        ), 404
+</html>""")
 
-    # Raw lines for fidelity, plus parsed for pretty table
-    lines = read_csv_lines_as_text(csv_path)
-    headers, table_rows = parse_csv_for_table(csv_path)
-
-    # Safe, lossless exposure of the last raw request body to the UI (may be None)
-    last_raw_b64 = base64.b64encode(LAST_RAW_BODY).decode("ascii") if LAST_RAW_BODY is not None else None
-
-    return render_template_string(
-        """<!doctype html>
+LOGS_TMPL = register_template("""<!doctype html>
 <html lang="en">
 <head>
   <meta charset="utf-8">
@@ -116,6 +106,7 @@ def show_slug(slug):
   <div class="actions">
     <button id="btnSelectAll" class="btn secondary" type="button">Select All</button>  <!-- NEW -->
     <button id="btnToggle" class="btn secondary" type="button" aria-pressed="true">Switch to Raw</button> <!-- CHANGED default -->
+    <button id="btnFollow" class="btn secondary" type="button" aria-pressed="true">Following</button>
     <a class="btn secondary" href="/">Back to alerts</a>
     <button id="btnNext" class="btn" type="button">Next</button>
   </div>
@@ -143,7 +134,7 @@ def show_slug(slug):
             {% endfor %}
           </tr>
         </thead>
-        <tbody>
+        <tbody id="tableBody">
           {% for row in table_rows %}
             <tr data-i="{{ loop.index0 }}">
               <td>{{ loop.index0 }}</td>
@@ -165,6 +156,7 @@ def show_slug(slug):
   const slug = {{ slug | tojson | safe }};
   const csvName = {{ csv_name | tojson | safe }};
   const allLines = {{ lines | tojson | safe }}; // authoritative raw lines for sending
+  const followFrom = {{ follow_from | tojson | safe }}; // committed line/row counts at render time
 
   const listView = document.getElementById("listView");
   const tableView = document.getElementById("tableView");
@@ -209,6 +201,58 @@ def show_slug(slug):
     }
   });
 
+  // Follow mode: rows appended to the CSV are pushed here. An index we already show
+  // (a trailing line that was still being written) is replaced rather than duplicated.
+  const btnFollow = document.getElementById("btnFollow");
+  const rowsEl = document.getElementById("rows");
+  const tableBody = document.getElementById("tableBody");
+  let stream = null;
+
+  function putLine(i, text){
+    allLines[i] = text;
+    let div = rowsEl.querySelector(`.row[data-i="${i}"]`);
+    if(!div){
+      div = document.createElement("div"); div.className = "row"; div.setAttribute("data-i", i);
+      rowsEl.appendChild(div);
+    }
+    div.textContent = text;
+  }
+
+  function putRow(i, cells){
+    let tr = tableBody.querySelector(`tr[data-i="${i}"]`);
+    if(!tr){
+      tr = document.createElement("tr"); tr.setAttribute("data-i", i);
+      tableBody.appendChild(tr);
+    }
+    tr.replaceChildren(...[String(i), ...cells].map(text => {
+      const td = document.createElement("td"); td.textContent = text; return td;
+    }));
+  }
+
+  function follow(){
+    const url = `/logs/${encodeURIComponent(slug)}/stream?line=${followFrom.line}&row=${followFrom.row}`;
+    stream = new EventSource(url);
+    stream.addEventListener("rows", (e)=>{
+      const data = JSON.parse(e.data);
+      data.lines.forEach((text, k) => putLine(data.line + k, text));
+      data.rows.forEach((cells, k) => putRow(data.row + k, cells));
+      followFrom.line = data.line + data.lines.length;
+      followFrom.row = data.row + data.rows.length;
+    });
+    stream.addEventListener("reset", ()=> window.location.reload());
+  }
+
+  btnFollow.addEventListener("click", ()=>{
+    if(stream){
+      stream.close(); stream = null;
+      btnFollow.textContent = "Follow"; btnFollow.setAttribute("aria-pressed","false");
+    }else{
+      follow();
+      btnFollow.textContent = "Following"; btnFollow.setAttribute("aria-pressed","true");
+    }
+  });
+  follow();
+
   function getSelectedIndices(){
     // collect indices from both views (in case user flips views mid-selection)
     const fromRows=[...document.querySelectorAll(".row.selected")].map(el=>Number(el.getAttribute("data-i")));
@@ -246,25 +290,120 @@ def show_slug(slug):
 </script>
 
   </body>
-</html>""",
+</html>""")
+
+
+@logs_bp.get("/<slug>")
+def show_slug(slug):
+    csv_path = csv_path_for_slug(slug)
+    if not csv_path.exists():
+        available = list_available_csvs()
+        return render_cached(
+            LOGS_MISSING_TMPL,
+            slug=slug,
+            expected=f"{slug}_log.csv",
+            available=available
+        ), 404
+
+    # The page depends only on the CSV and the last alert body posted to us
+    st = csv_path.stat()
+    etag = etag_for(csv_path.name, st.st_mtime_ns, st.st_size, LAST_BODY_DIGEST, LAST_RAW_CONTENT_TYPE)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    # Raw lines for fidelity, plus parsed for pretty table; only bytes appended since the last view are parsed
+    headers, lines, table_rows, committed_lines, committed_rows = tail_for(csv_path).snapshot()
+
+    # Safe, lossless exposure of the last raw request body to the UI (may be None)
+    last_raw_b64 = base64.b64encode(LAST_RAW_BODY).decode("ascii") if LAST_RAW_BODY is not None else None
+
+    body = render_cached(
+        LOGS_TMPL,
         slug=slug,
         csv_name=csv_path.name,
         csv_path=str(csv_path),
         lines=lines,
         headers=headers,
         table_rows=table_rows,
+        follow_from={"line": committed_lines, "row": committed_rows},
         last_json_body=LAST_JSON_BODY,
         last_raw_b64=last_raw_b64,
         last_raw_content_type=LAST_RAW_CONTENT_TYPE,
     )
+    return with_etag(body, etag)
+
+@logs_bp.get("/<slug>/stream")
+def follow_slug(slug):
+    """Server-sent events with the lines and rows appended to the CSV after ?line=&row=."""
+    csv_path = csv_path_for_slug(slug)
+    if not csv_path.exists():
+        return jsonify(error=f"{slug}_log.csv not found"), 404
+    line = request.args.get("line", 0, type=int)
+    row = request.args.get("row", 0, type=int)
+
+    def events():
+        nonlocal line, row
+        tail = tail_for(csv_path)
+        generation = tail.generation
+        yield "retry: 3000\n\n"  # sends the headers now, the first rows may be a while
+        last_sent = time.monotonic()
+        while True:
+            try:
+                tail.refresh()
+            except FileNotFoundError:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            new_lines, new_rows = tail.since(line, row)
+            if tail.generation != generation or line > len(tail.lines) or row > len(tail.rows):
+                # the file was replaced or truncated under us
+                yield "event: reset\ndata: {}\n\n"
+                return
+            if new_lines or new_rows:
+                data = json.dumps({"line": line, "row": row, "lines": new_lines, "rows": new_rows})
+                yield f"event: rows\ndata: {data}\n\n"
+                line += len(new_lines)
+                row += len(new_rows)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > FOLLOW_HEARTBEAT_S:
+                yield ": keepalive\n\n"  # lets the server notice a closed page
+                last_sent = time.monotonic()
+            time.sleep(FOLLOW_POLL_S)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def prefetch_case(alert_payload, slug):
+    """Ask the Backend to warm retrieval for this alert while the analyst reads the logs."""
+    case_id = case_id_for(alert_payload)
+    if not case_id:
+        return
+
+    def send():
+        # only the log's size: enough for the Backend to bound the largest prompt of this case
+        csv_path = csv_path_for_slug(slug)
+        log_line_count, log_bytes = tail_for(csv_path).size() if csv_path.exists() else (0, 0)
+        try:
+            requests.post(f"{BACKEND_URL}/prefetch",
+                          json={"case_id": case_id, "siem_alert": {"raw": alert_payload},
+                                "log_line_count": log_line_count, "log_bytes": log_bytes},
+                          timeout=60)
+        except requests.RequestException as e:
+            print(f"prefetch for {case_id} failed: {e}")
+
+    threading.Thread(target=send, daemon=True).start()
+
 
 @logs_bp.post("/<slug>")
 def handle_log(slug):
-    global LAST_RAW_BODY, LAST_JSON_BODY, LAST_RAW_CONTENT_TYPE
+    global LAST_RAW_BODY, LAST_JSON_BODY, LAST_RAW_CONTENT_TYPE, LAST_BODY_DIGEST
     LAST_RAW_BODY = request.get_data(cache=True)
+    LAST_BODY_DIGEST = hashlib.sha1(LAST_RAW_BODY).hexdigest()
     LAST_JSON_BODY = request.get_json(cache=True, force=True, silent=True)
     LAST_RAW_CONTENT_TYPE = request.headers.get("Content-Type")  # NEW
     data = request.get_json(force=True, silent=True)
+    prefetch_case(LAST_JSON_BODY, slug)
     print(f"\n=== /logs/{slug} received ===")
     try:
         print("DATA:", LAST_JSON_BODY)
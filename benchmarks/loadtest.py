@@ -0,0 +1,265 @@
+# loadtest.py
+# End-to-end load generator for the alerts -> logs -> analysis -> llm flow.
+#
+# Starts the real Frontend app and a mock Backend (fixed + jittered LLM latency)
+# in this process, then ramps up virtual analysts that each loop through:
+#   GET /  ->  POST /logs/<slug>  ->  GET /logs/<slug>  ->  POST /analysis/payload
+#   ->  POST /analysis/initial-analysis  ->  POST /analysis/export-pdf
+# and reports throughput, latency percentiles and error rates per route.
+#
+# The mock Backend echoes the case id it was asked about, so the report also
+# counts "state mismatches": drafts generated for another analyst's alert
+# because the Frontend keeps the current case in module globals.
+#
+#   python benchmarks/loadtest.py --users 20 --ramp 10 --duration 60 --llm-latency 2
+#   python benchmarks/loadtest.py --users 5 --fake-pdf 0.3 --out /tmp/load.json
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import shutil
+import tempfile
+import threading
+import statistics
+from pathlib import Path
+
+import requests
+from flask import Flask, request as flask_request, Response
+from werkzeug.serving import make_server
+
+ROOT = Path(__file__).resolve().parent.parent
+FRONTEND_DIR = ROOT / "Frontend"
+
+ROUTES = ["GET /", "POST /logs/<slug>", "GET /logs/<slug>", "POST /analysis/payload",
+          "POST /analysis/initial-analysis", "POST /analysis/export-pdf"]
+
+
+# --- servers ---------------------------------------------------------------------------------------------------------
+
+def mock_backend(llm_latency, llm_jitter):
+    app = Flask("mock_backend")
+
+    @app.post("/llm")
+    def llm():
+        payload = flask_request.get_json(force=True, silent=True) or {}
+        time.sleep(max(0.0, random.gauss(llm_latency, llm_jitter)))
+        case_id = payload.get("case_id", "")
+        return Response(f"Title: Load test report\nDate: 2025-01-01\n\n## Alert Summary:\ncase_id={case_id}\n"
+                        f"lines={len(payload.get('log_lines') or [])}\n", mimetype="text/plain")
+
+    @app.post("/prefetch")
+    def prefetch():
+        return {"status": "ok"}
+
+    @app.post("/reports/approve")
+    def approve_report():
+        return {"status": "ok", "id": 0}
+
+    return app
+
+
+def serve(app):
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def load_frontend(backend_url, fake_pdf_s):
+    # the Frontend resolves RagData/ relative to its working directory at import time
+    os.chdir(FRONTEND_DIR)
+    sys.path.insert(0, str(FRONTEND_DIR))
+    import main as frontend_main
+    from routes import analysis, logs
+
+    analysis.BACKEND_URL = backend_url
+    logs.BACKEND_URL = backend_url
+    # keep load test (and fake) PDFs out of the real cache
+    analysis.PDF_CACHE_DIR = Path(tempfile.mkdtemp(prefix="loadtest_pdf_cache_"))
+    if fake_pdf_s is not None:
+        class FakePage:
+            def set_content(self, html, wait_until=None):
+                time.sleep(fake_pdf_s)
+
+            def pdf(self, **kwargs):
+                return b"%PDF-1.4 load test\n"
+
+        class FakeBrowser:
+            def new_page(self):
+                return FakePage()
+
+            def close(self):
+                pass
+
+        class FakePlaywright:
+            chromium = type("Chromium", (), {"launch": lambda self: FakeBrowser()})()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+        analysis.sync_playwright = FakePlaywright
+    return frontend_main.app, analysis.PDF_CACHE_DIR
+
+
+def load_alerts():
+    alerts = []
+    for p in sorted((FRONTEND_DIR / "RagData" / "alert").glob("*.json")):
+        base = p.stem
+        slug = base.split("_", 1)[0] if "_" in base else base  # same rule as the alerts page
+        alerts.append((slug, json.loads(p.read_text(encoding="utf-8"))))
+    return alerts
+
+
+# --- virtual users ---------------------------------------------------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {r: [] for r in ROUTES}
+        self.errors = {r: 0 for r in ROUTES}
+        self.flows = 0
+        self.state_mismatches = 0
+
+    def record(self, route, elapsed, ok):
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+
+
+def virtual_user(vu_id, base, alerts, stats, stop_at, think_s):
+    session = requests.Session()
+    rng = random.Random(vu_id)
+    iteration = 0
+
+    def call(route, method, url, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            resp = session.request(method, base + url, timeout=600, **kwargs)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            resp, ok = None, False
+        stats.record(route, time.perf_counter() - t0, ok)
+        return resp if ok else None
+
+    while time.monotonic() < stop_at:
+        iteration += 1
+        slug, alert = rng.choice(alerts)
+        case_id = next((it.get("alert_id") for it in alert if isinstance(it, dict) and it.get("alert_id")), "")
+
+        if call("GET /", "GET", "/") is None:
+            continue
+        call("POST /logs/<slug>", "POST", f"/logs/{slug}", json=alert)
+        page = call("GET /logs/<slug>", "GET", f"/logs/{slug}")
+        if page is None:
+            continue
+        time.sleep(think_s)
+        lines = [f"line {i}" for i in range(rng.randint(1, 20))]
+        call("POST /analysis/payload", "POST", "/analysis/payload",
+             json={"slug": slug, "lines": lines, "last_json_body": alert})
+        draft = call("POST /analysis/initial-analysis", "POST", "/analysis/initial-analysis",
+                     json={"initial_analysis": f"vu {vu_id} iteration {iteration}"})
+        if draft is None:
+            continue
+        text = draft.json().get("llm_suggestion", "")
+        if f"case_id={case_id}" not in text:
+            with stats._lock:
+                stats.state_mismatches += 1
+        # unique content per iteration, so the PDF cache does not hide render cost
+        call("POST /analysis/export-pdf", "POST", "/analysis/export-pdf",
+             json={"content": f"{text}\n\nvu={vu_id} iteration={iteration}"})
+        with stats._lock:
+            stats.flows += 1
+        time.sleep(think_s)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def report(stats, elapsed):
+    rows = {}
+    for route in ROUTES:
+        lat = stats.latencies[route]
+        if not lat:
+            continue
+        rows[route] = {
+            "requests": len(lat),
+            "errors": stats.errors[route],
+            "error_rate": stats.errors[route] / len(lat),
+            "throughput_rps": len(lat) / elapsed,
+            "p50_ms": percentile(lat, 50) * 1e3,
+            "p90_ms": percentile(lat, 90) * 1e3,
+            "p95_ms": percentile(lat, 95) * 1e3,
+            "p99_ms": percentile(lat, 99) * 1e3,
+            "max_ms": max(lat) * 1e3,
+            "mean_ms": statistics.fmean(lat) * 1e3,
+        }
+    return {
+        "elapsed_s": elapsed,
+        "flows_completed": stats.flows,
+        "flows_per_min": stats.flows / elapsed * 60,
+        "state_mismatches": stats.state_mismatches,
+        "routes": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Tier 0.5 Frontend against a mock Backend")
+    parser.add_argument("--users", type=int, default=10, help="virtual analysts at full load")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds to ramp from 0 to --users")
+    parser.add_argument("--duration", type=float, default=60.0, help="total test seconds, ramp included")
+    parser.add_argument("--think", type=float, default=0.5, help="pause between analyst steps (s)")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="mock LLM mean latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="mock LLM latency std dev (s)")
+    parser.add_argument("--fake-pdf", type=float, default=None, metavar="SECONDS",
+                        help="replace Chromium with a fake renderer taking SECONDS per PDF")
+    parser.add_argument("--out", help="write the report as JSON here")
+    args = parser.parse_args()
+    out = Path(args.out).resolve() if args.out else None
+
+    backend_server, backend_url = serve(mock_backend(args.llm_latency, args.llm_jitter))
+    frontend_app, pdf_cache_dir = load_frontend(backend_url, args.fake_pdf)
+    frontend_server, base = serve(frontend_app)
+    alerts = load_alerts()
+    stats = Stats()
+
+    t_start = time.monotonic()
+    stop_at = t_start + args.duration
+    threads = []
+    for vu_id in range(args.users):
+        delay = args.ramp * vu_id / max(1, args.users)
+        time.sleep(max(0.0, t_start + delay - time.monotonic()))
+        t = threading.Thread(target=virtual_user, args=(vu_id, base, alerts, stats, stop_at, args.think),
+                             daemon=True)
+        t.start()
+        threads.append(t)
+        print(f"\r{len(threads)}/{args.users} virtual users", end="", flush=True)
+    print()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t_start
+
+    result = report(stats, elapsed)
+    result["config"] = vars(args)
+    print(f"{'route':34} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for route, r in result["routes"].items():
+        print(f"{route:34} {r['requests']:6d} {r['error_rate'] * 100:5.1f}% {r['throughput_rps']:7.2f} "
+              f"{r['p50_ms']:7.0f}ms {r['p95_ms']:7.0f}ms {r['p99_ms']:7.0f}ms {r['max_ms']:7.0f}ms")
+    print(f"flows completed: {result['flows_completed']} ({result['flows_per_min']:.1f}/min), "
+          f"state mismatches: {result['state_mismatches']}")
+    if out:
+        out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"wrote {out}")
+    frontend_server.shutdown()
+    backend_server.shutdown()
+    shutil.rmtree(pdf_cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
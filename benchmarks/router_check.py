@@ -0,0 +1,108 @@
+# router_check.py
+# Exercises the Backend's model Router against the local stand-in LLM (Backend/stub_llm.py).
+#
+# Starts the stub in this process, then checks the three routing paths with
+# short latencies:
+#   hedge     slow primary, fast hedge: the hedge wins, the primary is cut off and
+#             its wait is recorded as a censored first-token sample
+#   fallback  primary answers HTTP 500: the hedge is started right away instead of
+#             at the hedge threshold
+#   deadline  neither model answers in time: TimeoutError at the deadline
+# Exits non-zero if any check fails.
+#
+#   python benchmarks/router_check.py
+import sys
+import time
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+from werkzeug.serving import make_server
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "Backend"
+
+# model name -> "first_token_s:total_s" in the stub
+STUB_LATENCY = "slow=3:4,fast=0.2:0.5,hang=10:11"
+STUB_FAIL = "broken"
+
+
+def serve_stub():
+    import stub_llm
+    stub_llm.LATENCY = stub_llm.parse_latency(STUB_LATENCY)
+    stub_llm.FAIL = set(STUB_FAIL.split(","))
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log per completion
+    server = make_server("127.0.0.1", 0, stub_llm.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name:9} {detail}")
+    return ok
+
+
+def check_hedge(providers, base_url):
+    providers.LLM_HEDGE_AFTER_S = 0.5
+    primary = providers.Provider("slow", base_url=base_url, api_key="stub")
+    router = providers.Router(primary, providers.Provider("fast", base_url=base_url, api_key="stub"),
+                              deadline_s=10)
+    completion = router.complete("hedge check")
+    time.sleep(0.3)  # the losing primary records its sample after the winner returns
+    samples = list(primary.latency.first_token_s)
+    return check("hedge",
+                 completion.model == "fast" and completion.hedged and router.hedges_won == 1
+                 and len(samples) == 1 and samples[0] < 2.0,
+                 f"winner={completion.model} in {completion.elapsed_s:.2f}s, "
+                 f"primary censored first-token samples={[round(s, 2) for s in samples]}")
+
+
+def check_fallback(providers, base_url):
+    providers.LLM_HEDGE_AFTER_S = 30  # a fallback must not wait for the hedge threshold
+    primary = providers.Provider("broken", base_url=base_url, api_key="stub")
+    router = providers.Router(primary, providers.Provider("fast", base_url=base_url, api_key="stub"),
+                              deadline_s=30)
+    completion = router.complete("fallback check")
+    return check("fallback",
+                 completion.model == "fast" and completion.elapsed_s < 10 and primary.latency.errors == 1,
+                 f"winner={completion.model} in {completion.elapsed_s:.2f}s, primary errors={primary.latency.errors}")
+
+
+def check_deadline(providers, base_url):
+    providers.LLM_HEDGE_AFTER_S = 0.3
+    primary = providers.Provider("hang", base_url=base_url, api_key="stub")
+    hedge = providers.Provider("hang", base_url=base_url, api_key="stub")
+    router = providers.Router(primary, hedge, deadline_s=1.0)
+    t_start = time.perf_counter()
+    try:
+        router.complete("deadline check")
+        raised = None
+    except TimeoutError as e:
+        raised = e
+    elapsed = time.perf_counter() - t_start
+    time.sleep(0.3)
+    censored = len(primary.latency.first_token_s) + len(hedge.latency.first_token_s)
+    return check("deadline",
+                 raised is not None and elapsed < 2.0 and router.deadlines_missed == 1 and censored == 2,
+                 f"raised={type(raised).__name__ if raised else None} after {elapsed:.2f}s, "
+                 f"censored samples={censored}")
+
+
+def main():
+    argparse.ArgumentParser(description="Check hedging, fallback and deadlines of the model Router").parse_args()
+    sys.path.insert(0, str(BACKEND_DIR))
+    import providers
+
+    server, base_url = serve_stub()
+    try:
+        results = [check_hedge(providers, base_url),
+                   check_fallback(providers, base_url),
+                   check_deadline(providers, base_url)]
+    finally:
+        server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# profiling.py
+# Opt-in per-request sampling profiler, shared by the Frontend and the Backend.
+#
+# A request is profiled when it carries the header "X-Profile: 1" or the query
+# flag "?profile=1", or randomly with probability PROFILE_SAMPLE_RATE (for
+# always-on, low-overhead profiling in production). While the request runs, a
+# side thread samples, every PROFILE_INTERVAL_MS, the request thread and every
+# thread started after the request began (router streams, section workers), so
+# work handed off to other threads still shows up. Each stack is rooted at its
+# thread's name and stored in folded-stack format ("a;b;c <count>"), which
+# flamegraph.pl, speedscope and inferno can all render as a flamegraph.
+# The response carries the id in "X-Profile-Id"; fetch it from /profiles/<id>.
+import os
+import re
+import sys
+import uuid
+import random
+import threading
+from collections import Counter
+from pathlib import Path
+from flask import Blueprint, Response, abort, g, jsonify, request
+
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", "outputs/profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5") or 5)
+
+profiles_bp = Blueprint("profiles", __name__, url_prefix="/profiles")
+
+
+class StackSampler(threading.Thread):
+    """Samples the request thread and the threads started after it, at a fixed interval until stopped.
+
+    Threads started meanwhile by other concurrent requests are sampled too; their stacks are
+    rooted at their own thread names."""
+
+    def __init__(self, target_ident: int, interval_s: float):
+        super().__init__(daemon=True, name="stack-sampler")
+        self.target_ident = target_ident
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self._halt = threading.Event()
+        self._existing = set(sys._current_frames()) - {target_ident}
+
+    def run(self):
+        while not self._halt.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident or (ident != self.target_ident and ident in self._existing):
+                    continue
+                # numbered names (Thread-12, ThreadPoolExecutor-3_0) merge into one root
+                root = "request" if ident == self.target_ident else re.sub(r"\d+", "N", names.get(ident, "thread"))
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(f"[{root}]")
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def _wants_profile() -> bool:
+    if request.headers.get("X-Profile", "").lower() in ("1", "true", "yes"):
+        return True
+    if request.args.get("profile", "").lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _finish_profile():
+    sampler = g.pop("profile_sampler", None)
+    if sampler is None:
+        return None
+    sampler.stop()
+    profile_id = g.pop("profile_id")
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    with (PROFILE_DIR / f"{profile_id}.folded").open("w", encoding="utf-8") as f:
+        f.write(f"# {request.method} {request.path}\n")
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return profile_id
+
+
+def init_profiling(app, paths):
+    """Profile requests to any of the given path prefixes and expose /profiles."""
+    paths = tuple(paths)
+
+    @app.before_request
+    def _start_profile():
+        if not request.path.startswith(paths) or not _wants_profile():
+            return
+        g.profile_id = uuid.uuid4().hex[:12]
+        g.profile_sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0)
+        g.profile_sampler.start()
+
+    @app.after_request
+    def _stop_profile(response):
+        profile_id = _finish_profile()
+        if profile_id:
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    @app.teardown_request
+    def _stop_profile_on_error(exc):
+        # after_request is skipped on unhandled errors; still keep the profile
+        _finish_profile()
+
+    app.register_blueprint(profiles_bp)
+
+
+@profiles_bp.get("/")
+def list_profiles():
+    if not PROFILE_DIR.exists():
+        return jsonify(profiles=[])
+    files = sorted(PROFILE_DIR.glob("*.folded"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return jsonify(profiles=[p.stem for p in files])
+
+
+@profiles_bp.get("/<profile_id>")
+def get_profile(profile_id):
+    if not profile_id.isalnum():
+        abort(404)
+    path = PROFILE_DIR / f"{profile_id}.folded"
+    if not path.exists():
+        abort(404)
+    return Response(path.read_text(encoding="utf-8"), mimetype="text/plain")